@@ -0,0 +1,264 @@
+"""Standalone HTTP prediction service.
+
+Run with any ASGI server, e.g.:
+    uvicorn api:app --host 0.0.0.0 --port 8000
+
+Endpoints:
+    GET  /health         -> {"status": "ok"}
+    GET  /stats          -> micro-batching batch size and latency summary
+    GET  /metrics        -> stage latencies and counters in Prometheus text format
+    POST /predict        -> body: {"Age": 30, "BMI": 24.5, ...}
+    POST /predict/batch  -> body: {"rows": [{...}, {...}]}
+
+Inputs use the 12 ``feature_names`` as keys.  Marital Status and Gender may be
+0/1 or Yes/No and Male/Female, and Snoring Rate, Limb Movement and Eye
+Movement may be blank, same as in the app.  The model is loaded once when the
+server starts and rows are checked against the schema in validation.py; an
+invalid row gets an ``error`` message plus the list of all its ``errors``.
+
+The served model is the active version of the model registry, or
+``STRESS_MODEL_PATH`` when there is none; newly activated versions are swapped
+in without a restart (see model_registry.py).  Every prediction reports its
+``model_version``, the ``probabilities`` of all five stress levels, the
+``confidence`` (probability of the predicted level) and the
+``confidence_margin`` over the runner-up, all from one pass over the model.
+
+Set ``STRESS_MICROBATCH_MS`` (e.g. 2) to coalesce concurrent requests into one
+model call, see microbatch.py.  ``STRESS_MICROBATCH_ROWS`` caps the
+rows per batch.  Set ``STRESS_WORKERS`` to predict in that many worker
+processes, see worker_pool.py; requests wait for the workers on executor
+threads, so concurrent requests are predicted in parallel.
+"""
+import asyncio
+import json
+import logging
+import os
+
+import numpy as np
+
+from metrics import metrics
+from microbatch import MicroBatcher
+from model_registry import ModelRegistry, RegistryWatcher, active_model
+from stress_model import describe_predictions, load_model, outputs_from_scores, stress_descriptions
+from validation import validate_records
+from worker_pool import WorkerPool, pool_from_env
+
+# Maximum request body size, to keep a single request from exhausting memory
+MAX_BODY_BYTES = 16 * 1024 * 1024
+
+MICROBATCH_WAIT_MS = float(os.environ.get("STRESS_MICROBATCH_MS", "0"))
+MICROBATCH_MAX_ROWS = int(os.environ.get("STRESS_MICROBATCH_ROWS", "256"))
+
+logger = logging.getLogger("stress_api")
+
+_served = None
+_batcher = None
+
+
+class RequestError(Exception):
+    def __init__(self, status, message, errors=None):
+        super().__init__(message)
+        self.status = status
+        self.message = message
+        self.errors = errors
+
+
+class ServedModel:
+    """The model the service predicts with and its version, swapped as one by the registry watcher."""
+
+    def __init__(self, model, version):
+        self._current = (model, version)
+
+    @property
+    def model(self):
+        return self._current[0]
+
+    @property
+    def model_version(self):
+        return self._current[1]
+
+    def swap(self, path, model, version):
+        previous = self._current[0]
+        self._current = (model, version)
+        if hasattr(previous, "close"):
+            previous.close()
+
+    def scores_versioned(self, X):
+        """``decision_function`` scores of ``X`` plus the ``(version, classes)`` of the model."""
+        model, version = self._current
+        return model.decision_function(X), (version, model.classes_)
+
+
+def _load(path):
+    return pool_from_env(path) or load_model(path)
+
+
+def get_served():
+    global _served
+    if _served is None:
+        path, version = active_model()
+        _served = ServedModel(_load(path), version)
+        RegistryWatcher(ModelRegistry(), _served, loader=_load).start()
+    return _served
+
+
+def _log_batch(rows, requests, seconds):
+    logger.debug("batch rows=%d requests=%d latency=%.3fms", rows, requests, seconds * 1000)
+
+
+def get_batcher():
+    global _batcher
+    if _batcher is None and MICROBATCH_WAIT_MS > 0:
+        _batcher = MicroBatcher(
+            get_served().scores_versioned, max_wait_ms=MICROBATCH_WAIT_MS,
+            max_rows=MICROBATCH_MAX_ROWS, on_batch=_log_batch, returns_info=True
+        )
+    return _batcher
+
+
+async def predict_matrix(X):
+    """``(labels, probabilities, margins, version)`` for the rows of ``X``."""
+    metrics.increment("predictions", len(X))
+    batcher = get_batcher()
+    with metrics.time("model_predict"):
+        if batcher is not None:
+            scores, (version, classes) = await batcher.predict(X)
+        elif isinstance(get_served().model, WorkerPool):
+            # The workers do the work; waiting for them off the event loop lets requests run in parallel
+            scores, (version, classes) = await asyncio.get_running_loop().run_in_executor(
+                None, get_served().scores_versioned, X)
+        else:
+            scores, (version, classes) = get_served().scores_versioned(X)
+    return (*outputs_from_scores(scores, classes), version)
+
+
+async def predict_rows(rows):
+    """Score a list of JSON rows, returning one result dict per row."""
+    results = [None] * len(rows)
+    records = []
+    record_index = []
+    for i, values in enumerate(rows):
+        if isinstance(values, dict):
+            records.append(values)
+            record_index.append(i)
+        else:
+            message = "Each row must be a JSON object keyed by feature name."
+            results[i] = {"error": message, "errors": [message]}
+
+    X, validation = validate_records(records)
+    valid = validation.valid
+    for k in np.flatnonzero(~valid):
+        messages = validation.messages(k)
+        results[record_index[k]] = {"error": " ".join(messages), "errors": messages}
+
+    if valid.any():
+        predictions, probabilities, margins, model_version = await predict_matrix(X[valid])
+        labels = describe_predictions(predictions)
+        valid_index = [record_index[k] for k in np.flatnonzero(valid)]
+        for i, prediction, label, row, margin in zip(valid_index, predictions, labels, probabilities, margins):
+            results[i] = {
+                "prediction": int(prediction),
+                "stress_level": label,
+                "confidence": float(row.max()),
+                "confidence_margin": float(margin),
+                "probabilities": dict(zip(stress_descriptions.values(), row.tolist())),
+                "model_version": model_version,
+            }
+    return results
+
+
+async def _read_json(receive):
+    body = bytearray()
+    while True:
+        message = await receive()
+        body.extend(message.get("body", b""))
+        if len(body) > MAX_BODY_BYTES:
+            raise RequestError(413, "Request body too large.")
+        if not message.get("more_body", False):
+            break
+    try:
+        return json.loads(body or b"null")
+    except ValueError:
+        raise RequestError(400, "Request body must be valid JSON.") from None
+
+
+async def _send_body(send, status, body, content_type):
+    await send({
+        "type": "http.response.start",
+        "status": status,
+        "headers": [(b"content-type", content_type), (b"content-length", str(len(body)).encode())],
+    })
+    await send({"type": "http.response.body", "body": body})
+
+
+async def _send_json(send, status, payload):
+    await _send_body(send, status, json.dumps(payload).encode(), b"application/json")
+
+
+async def handle_predict(payload):
+    result = (await predict_rows([payload]))[0]
+    if "error" in result:
+        raise RequestError(422, result["error"], result["errors"])
+    return result
+
+
+async def handle_batch(payload):
+    rows = payload.get("rows") if isinstance(payload, dict) else payload
+    if not isinstance(rows, list):
+        raise RequestError(400, "Batch body must be a list of rows or {\"rows\": [...]}.")
+    return {"results": await predict_rows(rows)}
+
+
+routes = {
+    ("POST", "/predict"): handle_predict,
+    ("POST", "/predict/batch"): handle_batch,
+}
+
+
+async def _lifespan(receive, send):
+    while True:
+        message = await receive()
+        if message["type"] == "lifespan.startup":
+            try:
+                get_served()
+                get_batcher()
+            except Exception as e:
+                await send({"type": "lifespan.startup.failed", "message": str(e)})
+                return
+            await send({"type": "lifespan.startup.complete"})
+        elif message["type"] == "lifespan.shutdown":
+            await send({"type": "lifespan.shutdown.complete"})
+            return
+
+
+async def app(scope, receive, send):
+    if scope["type"] == "lifespan":
+        await _lifespan(receive, send)
+        return
+    if scope["type"] != "http":
+        return
+
+    method, path = scope["method"], scope["path"].rstrip("/") or "/"
+    try:
+        if method == "GET" and path == "/health":
+            await _send_json(send, 200, {"status": "ok"})
+            return
+        if method == "GET" and path == "/stats":
+            batcher = get_batcher()
+            await _send_json(send, 200, {"microbatch": batcher.stats.summary() if batcher else None})
+            return
+        if method == "GET" and path == "/metrics":
+            await _send_body(send, 200, metrics.prometheus_text().encode(), b"text/plain; version=0.0.4")
+            return
+        handler = routes.get((method, path))
+        if handler is None:
+            raise RequestError(404, "Not found.")
+        with metrics.time(f"api {path}"):
+            payload = await _read_json(receive)
+            await _send_json(send, 200, await handler(payload))
+    except RequestError as e:
+        body = {"error": e.message}
+        if e.errors is not None:
+            # Every problem with the row, as /predict/batch reports them
+            body["errors"] = e.errors
+        await _send_json(send, e.status, body)
@@ -1,11 +1,37 @@
+import sys
+import time
+
+# `streamlit run app.py -- --profile-startup` reports import and model load timings.
+# pandas, plotly and joblib are imported on first use, not here.
+profile_startup = "--profile-startup" in sys.argv[1:]
+startup_timings = {}
+_step_start = time.perf_counter()
+
+def mark_startup_step(step):
+    global _step_start
+    now = time.perf_counter()
+    startup_timings[step] = now - _step_start
+    _step_start = now
+
 import streamlit as st
-import joblib
+mark_startup_step("import streamlit")
 import numpy as np
-import pandas as pd
-import plotly.graph_objects as go
-from io import BytesIO
-import base64 
+import functools
 import os
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+mark_startup_step("import numpy")
+
+import charts
+import interpretation
+import recommendations as recommendations_rules
+import validation
+from metrics import metrics
+from stress_model import feature_names, load_model, model_path, stress_descriptions
+from model_registry import ModelRegistry, RegistryWatcher, active_model
+from prediction_cache import CachedPredictor
+from history_store import HistoryStore, history_columns
+mark_startup_step("import app modules")
 
 # -------------------------------
 # 1. Set Professional Background
@@ -105,31 +131,73 @@ set_professional_background()
 # 2. Load Model with Caching
 # -------------------------------
 
+model_registry = ModelRegistry()
+
+def _load_predictor():
+    start = time.perf_counter()
+    # STRESS_WORKERS=N predicts through a pool of N worker processes, see worker_pool.py
+    workers = int(os.environ.get("STRESS_WORKERS", "0"))
+    if workers > 0:
+        from worker_pool import WorkerPool
+
+        # Created from a background thread, so the pool does not fork: its
+        # workers memory-map the compiled model instead (see default_start_method)
+        loader = functools.partial(WorkerPool, processes=workers)
+    else:
+        loader = load_model
+    # The registry's active version, or model_path when there is none
+    path, version = active_model(model_registry)
+    predictor = CachedPredictor(path, loader=loader, version=version)
+    # Versions activated later are loaded in the background and swapped in, see model_registry.py
+    predictor.watcher = RegistryWatcher(model_registry, predictor, loader=loader).start()
+    predictor.load_seconds = time.perf_counter() - start
+    return predictor
+
+# One predictor per server process: its prediction cache is shared by all
+# sessions and it reloads the model when the model file changes.
+# Unpickling starts in the background so the page renders meanwhile.
 @st.cache_resource
-def load_model(model_path):
-    if not os.path.exists(model_path):
-        st.error(f"**Error:** Model file '{model_path}' not found. Please ensure it exists in the specified path.")
-        st.stop()
-    return joblib.load(model_path)
+def start_loading_predictor():
+    return ThreadPoolExecutor(max_workers=1).submit(_load_predictor)
+
+def get_predictor():
+    """Wait for the background model load to finish and return the predictor."""
+    predictor = predictor_future.result()
+    predictor.check_model_file()
+    return predictor
 
-# Specify the path to your model
-model_path = 'gradient_boosting_model.pkl'
+if model_registry.current_version() is None and not os.path.exists(model_path):
+    st.error(f"**Error:** Model file '{model_path}' not found. Please ensure it exists in the specified path.")
+    st.stop()
 
 # Load the trained Gradient Boosting model
-model = load_model(model_path)
+predictor_future = start_loading_predictor()
+
+# STRESS_SHADOW_MODEL runs a candidate model next to the production one, see shadow.py;
+# it is loaded on the shadow thread, so it never delays or breaks the page
+@st.cache_resource
+def get_shadow_scorer():
+    from shadow import shadow_from_env
+
+    return shadow_from_env()
 
-# Define feature names (ensure these match the order of your model's input features)
-feature_names = [
-    'Age', 'Marital Status', 'Gender', 'BMI', 'Snoring Rate',
-    'Respiration Rate', 'Body Temperature', 'Limb Movement',
-    'Blood Oxygen', 'Eye Movement', 'Sleeping Hours', 'Heart Rate'
-]
+shadow_scorer = get_shadow_scorer()
 
 # -------------------------------
 # 3. Initialize History
 # -------------------------------
-if 'history' not in st.session_state:
-    st.session_state.history = []
+# History is kept in a local SQLite store shared by all sessions, see history_store.py
+@st.cache_resource
+def get_history_store():
+    return HistoryStore()
+
+history_store = get_history_store()
+
+# Each browser keeps its history key in the URL, so it survives reconnects
+if 'uid' not in st.query_params:
+    st.query_params['uid'] = uuid.uuid4().hex
+user_key = st.query_params['uid']
+
 if 'show_history' not in st.session_state:
     st.session_state.show_history = False
 
@@ -259,225 +327,56 @@ with st.sidebar:
     user_input, age, bmi, marital_status, gender, snoring_rate, respiration_rate, body_temperature, limb_movement, blood_oxygen, eye_movement, sleeping_hours, heart_rate = get_user_input()
 
 # -------------------------------
-# 6. Define Stress Levels and Colors
+# 6. Stress Levels and Colors
 # -------------------------------
-stress_descriptions = {
-    0: "No Stress",
-    1: "Low Stress",
-    2: "Moderate Stress",
-    3: "High Stress",
-    4: "Max Stress"
-}
-
-colors = ['#d0f0c0', '#b0e57c', '#f2b700', '#f77f00', '#d62839']
+# stress_descriptions and colors are shared with the batch tools, see stress_model.py
 
 # -------------------------------
-# 7. Create Horizontal Bar Chart
+# 7. Horizontal Bar Chart
 # -------------------------------
-fig = go.Figure()
-
-for i in range(5):
-    fig.add_trace(go.Bar(
-        x=[1],
-        y=[0],
-        orientation='h',
-        name=stress_descriptions[i],
-        marker_color=colors[i],
-        width=0.6,
-        showlegend=False
-    ))
-
-fig.update_layout(
-    barmode='stack',
-    xaxis=dict(
-        tickvals=[0, 1, 2, 3, 4],
-        ticktext=["No Stress", "Low Stress", "Moderate Stress", "High Stress", "Max Stress"],
-        showgrid=False,
-        zeroline=False
-    ),
-    yaxis=dict(showticklabels=False, showgrid=False),
-    plot_bgcolor="white",
-    margin=dict(l=20, r=20, t=20, b=20),
-    height=250,
-    width=800
-)
+# The five-band base figure is built once per process, see charts.py
 
 # -------------------------------
 # 8. Decode User Input Function
 # -------------------------------
+# Band edges and labels are declared once in interpretation.py and shared with batch exports
 def decode_user_input(age, bmi, marital_status, gender, snoring_rate, respiration_rate, body_temperature, limb_movement, blood_oxygen, eye_movement, sleeping_hours, heart_rate):
-    if age <= 18:
-        age_desc = "(Adolescent)"
-    elif age <= 24:
-        age_desc = "(Young adult)"
-    elif age <= 45:
-        age_desc = "(Adult)"
-    elif age <= 64:
-        age_desc = "(Middle age adult)"
-    else:
-        age_desc = "(Older adult)"
-
-    if bmi < 18.5:
-        bmi_desc = "(Underweight)"
-    elif bmi <= 24.9:
-        bmi_desc = "(Normal weight)"
-    elif bmi <= 29.9:
-        bmi_desc = "(Overweight)"
-    elif bmi <= 30:
-        bmi_desc = "(Obese)"
-    else:
-        bmi_desc = "(Extremely Obese)"
-
-    marital_desc = "Married" if marital_status == 1 else "Not married"
-    gender_desc = "Male" if gender == 1 else "Female"
-
-    if snoring_rate <= 5:
-        snoring_desc = "(Normal)"
-    elif snoring_rate <= 15:
-        snoring_desc = "(Mild snoring)"
-    elif snoring_rate <= 30:
-        snoring_desc = "(Moderate snoring)"
-    elif snoring_rate <= 45:
-        snoring_desc = "(Heavy Snoring)"
-    else:
-        snoring_desc = "(Severe Snoring)"
-
-    if respiration_rate <= 11:
-        respiration_desc = "(Hypoventilation-Slow Breath)"
-    elif 12 <= respiration_rate <= 20:
-        respiration_desc = "(Normal)"
-    else:
-        respiration_desc = "(Hyperventilation-Rapid Breath)"
-
-    if body_temperature < 97.0:
-        body_temp_desc = "(Hypothermia-Low)"
-    elif 97.0 <= body_temperature <= 99.5:
-        body_temp_desc = "(Normal)"
-    else:
-        body_temp_desc = "(Hyperthermia-High)"
-
-    if limb_movement <= 5:
-        limb_desc = "(Normal)"
-    elif 6 <= limb_movement <= 25:
-        limb_desc = "(Moderate)"
-    else:
-        limb_desc = "(Severe)"
-
-    if blood_oxygen <= 69:
-        oxygen_desc = "(Cyanosis-Low)"
-    elif blood_oxygen <= 79:
-        oxygen_desc = "(Severe Hypoxia)"
-    elif blood_oxygen <= 89:
-        oxygen_desc = "(Low Oxygen Level)"
-    elif 90 <= blood_oxygen <= 94:
-        oxygen_desc = "(Moderate Oxygen Level)"
-    else:
-        oxygen_desc = "(Normal Oxygen Level)"
-
-    if eye_movement <= 25:
-        eye_desc = "(Normal)"
-    else:
-        eye_desc = "(High REM)"
-
-    if sleeping_hours <= 6:
-        sleep_desc = "(Sleep Deprivation)"
-    elif 7 <= sleeping_hours <= 9:
-        sleep_desc = "(Normal)"
-    else:
-        sleep_desc = "(Hypersomnia)"
-
-    if heart_rate <= 39:
-        heart_desc = "(Bradycardia-Too Slow)"
-    elif 40 <= heart_rate <= 75:
-        heart_desc = "(Normal)"
-    else:
-        heart_desc = "(Tachycardia-Too Rapid)"
-
-    return age_desc, bmi_desc, marital_desc, gender_desc, snoring_desc, respiration_desc, body_temp_desc, limb_desc, oxygen_desc, eye_desc, sleep_desc, heart_desc
+    return (
+        interpretation.describe('Age', age),
+        interpretation.describe('BMI', bmi),
+        interpretation.describe('Marital Status', marital_status),
+        interpretation.describe('Gender', gender),
+        interpretation.describe('Snoring Rate', snoring_rate),
+        interpretation.describe('Respiration Rate', respiration_rate),
+        interpretation.describe('Body Temperature', body_temperature),
+        interpretation.describe('Limb Movement', limb_movement),
+        interpretation.describe('Blood Oxygen', blood_oxygen),
+        interpretation.describe('Eye Movement', eye_movement),
+        interpretation.describe('Sleeping Hours', sleeping_hours),
+        interpretation.describe('Heart Rate', heart_rate),
+    )
 
 # -------------------------------
 # 9. Recommendations Function
 # -------------------------------
+# The rules are declared in recommendations.py and shared with batch cohort reports
 def provide_recommendations(
     bmi, blood_oxygen, heart_rate, 
     snoring_rate, respiration_rate, body_temperature, 
     limb_movement, eye_movement, sleeping_hours
 ):
-    recommendations = []
-    
-    # BMI Recommendations
-    if bmi < 18.5:
-        recommendations.append("📉 **Underweight**: Consider consulting a healthcare provider for a nutritional plan to reach a healthier weight.")
-    elif bmi <= 24.9:
-        recommendations.append("✅ **Normal Weight**: Great job maintaining a healthy BMI!")
-    elif bmi <= 29.9:
-        recommendations.append("⚖️ **Overweight**: Engaging in a balanced diet and regular physical activity can help manage your BMI.")
-    else:
-        recommendations.append("📈 **Obese**: It's advisable to seek guidance from a healthcare professional for a comprehensive weight management plan.")
-    
-    # Blood Oxygen Recommendations
-    if blood_oxygen < 90:
-        recommendations.append("🩸 **Low Blood Oxygen**: Low blood oxygen levels detected. Please consult a healthcare professional immediately.")
-    elif blood_oxygen <= 94:
-        recommendations.append("🟠 **Low Oxygen Level**: Consider deep breathing exercises and ensure you're in a well-ventilated environment.")
-    else:
-        recommendations.append("🟢 **Normal Blood Oxygen**: Your blood oxygen levels are within the normal range.")
-    
-    # Heart Rate Recommendations
-    if heart_rate < 40:
-        recommendations.append("❤️ **Bradycardia**: Abnormally low heart rate detected. Consider seeking medical advice.")
-    elif heart_rate <= 75:
-        recommendations.append("🟢 **Normal Heart Rate**: Your heart rate is within the normal range.")
-    else:
-        recommendations.append("❤️ **Tachycardia**: Abnormally high heart rate detected. It might be beneficial to engage in relaxation techniques or consult a healthcare provider.")
-    
-    # Snoring Rate Recommendations
-    if snoring_rate > 30:
-        recommendations.append("😴 **Heavy Snoring**: Persistent heavy snoring may indicate sleep apnea. Consider consulting a sleep specialist.")
-    elif snoring_rate > 15:
-        recommendations.append("😴 **Mild Snoring**: Moderate snoring can disrupt your sleep. Maintaining a healthy weight and avoiding alcohol before bedtime might help.")
-    else:
-        recommendations.append("✅ **Normal Snoring**: Your snoring rate is within the normal range.")
-    
-    # Respiration Rate Recommendations
-    if respiration_rate < 12:
-        recommendations.append("🌬️ **Slow Respiration**: A lower respiration rate may indicate hypoventilation. Consider breathing exercises.")
-    elif respiration_rate > 20:
-        recommendations.append("🌬️ **Rapid Respiration**: A higher respiration rate may indicate hyperventilation. Practice relaxation techniques.")
-    else:
-        recommendations.append("🟢 **Normal Respiration Rate**: Your respiration rate is within the normal range.")
-    
-    # Body Temperature Recommendations
-    if body_temperature < 97.0:
-        recommendations.append("🌡️ **Low Body Temperature**: Consider dressing warmly and consulting a healthcare provider if you feel unwell.")
-    elif body_temperature > 99.5:
-        recommendations.append("🌡️ **High Body Temperature**: Stay hydrated and consider seeking medical attention if the temperature persists.")
-    else:
-        recommendations.append("🟢 **Normal Body Temperature**: Your body temperature is within the normal range.")
-    
-    # Limb Movement Recommendations
-    if limb_movement > 25:
-        recommendations.append("🦵 **Severe Limb Movement**: Excessive limb movement during sleep may affect sleep quality. Consider relaxation techniques before bedtime.")
-    elif limb_movement > 5:
-        recommendations.append("🦵 **Moderate Limb Movement**: Some limb movement is normal, but excessive movement can disrupt sleep.")
-    else:
-        recommendations.append("✅ **Normal Limb Movement**: Your limb movement during sleep is within the normal range.")
-    
-    # Eye Movement Recommendations
-    if eye_movement > 25:
-        recommendations.append("👁️ **High REM Activity**: Elevated eye movement during sleep can be associated with stress. Consider stress-reduction techniques.")
-    else:
-        recommendations.append("🟢 **Normal Eye Movement**: Your eye movement during sleep is within the normal range.")
-    
-    # Sleeping Hours Recommendations
-    if sleeping_hours < 6:
-        recommendations.append("🛌 **Sleep Deprivation**: Aim for 7-9 hours of sleep for optimal health. Consider establishing a regular sleep schedule.")
-    elif sleeping_hours > 9:
-        recommendations.append("🛌 **Excessive Sleep**: Consistently sleeping more than 9 hours may affect your daily routine. Aim for 7-9 hours of sleep.")
-    else:
-        recommendations.append("🟢 **Normal Sleeping Hours**: Your sleep duration is within the recommended range.")
-    
-    return recommendations
+    rule_ids = recommendations_rules.recommend({
+        'BMI': bmi,
+        'Blood Oxygen': blood_oxygen,
+        'Heart Rate': heart_rate,
+        'Snoring Rate': snoring_rate,
+        'Respiration Rate': respiration_rate,
+        'Body Temperature': body_temperature,
+        'Limb Movement': limb_movement,
+        'Eye Movement': eye_movement,
+        'Sleeping Hours': sleeping_hours,
+    })
+    return [recommendations_rules.recommendation_text[rule_id] for rule_id in rule_ids]
 
 # -------------------------------
 # 10. Predict Button Functionality
@@ -491,31 +390,33 @@ if st.button("Predict Stress Level"):
     except ValueError:
         st.error("**Error:** Please ensure that Snoring Rate, Limb Movement, and Eye Movement are numeric values.")
     else:
-        # Validate input ranges
-        if not (18 <= age <= 80):
-            st.error("**Error:** Please insert the Age within the range (18-80).")
-        elif not (18.0 <= bmi <= 40.0):
-            st.error("**Error:** Please insert the BMI within the range (18.0-40.0).")
-        elif not (0 <= snoring_rate_val <= 50):
-            st.error("**Error:** Please insert the Snoring Rate within the range (0-50).")
-        elif not (0 <= respiration_rate <= 50):
-            st.error("**Error:** Please insert the Respiration Rate within the range (0-50).")
-        elif not (60.0 <= body_temperature <= 110.0):
-            st.error("**Error:** Please insert the Body Temperature within the range (60.0-110.0 °F).")
-        elif not (0 <= limb_movement_val <= 35):
-            st.error("**Error:** Please insert the Limb Movement within the range (0-35).")
-        elif not (60 <= blood_oxygen <= 110):
-            st.error("**Error:** Please insert the Blood Oxygen within the range (60-110).")
-        elif not (0 <= eye_movement_val <= 35):
-            st.error("**Error:** Please insert the Eye Movement within the range (0-35).")
-        elif not (0 <= sleeping_hours <= 24):
-            st.error("**Error:** Please insert the Sleeping Hours within the range (0-24).")
-        elif not (30 <= heart_rate <= 100):
-            st.error("**Error:** Please insert the Heart Rate within the range (30-100).")
+        # Validate all inputs at once and report every problem
+        user_input, input_validation = validation.validate_matrix(user_input)
+        if not input_validation.valid[0]:
+            for message in input_validation.messages(0):
+                st.error(f"**Error:** {message}")
         else:
-            # If inputs are valid, predict the stress level
-            prediction = model.predict(user_input)[0]
+            # If inputs are valid, predict the stress level and its class probabilities in one pass
+            prediction_start = time.perf_counter()
+            predictor = get_predictor()
+            # Keeps this session's last input, so after an edit only the
+            # splits whose outcome changed are evaluated again (see incremental.py).
+            # The scorer runs in this process even with STRESS_WORKERS set: a
+            # single edited row is cheaper to rescore here than to send to a
+            # worker, so the pool only serves the batch upload below.
+            scorer = st.session_state.get("incremental_scorer")
+            if scorer is None or scorer.model_version != predictor.model_version:
+                scorer = st.session_state.incremental_scorer = predictor.incremental_scorer()
+            predictions, probabilities, margins, model_version = predictor.predict_with_confidence(user_input, scorer)
+            prediction_seconds = time.perf_counter() - prediction_start
+            metrics.record("prediction", prediction_seconds)
+            if shadow_scorer is not None:
+                # Scored on the shadow thread; only the production result is shown
+                shadow_scorer.submit(user_input, predictions, model_version, prediction_seconds)
+            prediction = predictions[0]
             stress_level = stress_descriptions.get(prediction, "Unknown")
+            confidence = float(probabilities[0].max())
+            confidence_margin = float(margins[0])
         
             # Check if any of the optional inputs are empty or zero
             incomplete_data_warning = ""
@@ -525,45 +426,26 @@ if st.button("Predict Stress Level"):
                     "<span style='color:#d32f2f'>The prediction may not be highly accurate due to incomplete data.</span>"
                 )
         
-            # Add the chat bubble above the correct section
-            fig.add_annotation(
-                x=prediction + 0.5,  # Position the chat bubble based on the prediction
-                y=0.5,
-                text=f"<b>{stress_level}</b>",
-                showarrow=True,
-                arrowhead=2,
-                ax=0,
-                ay=-40,
-                font=dict(size=15, color="black"),
-                align="center",
-                bgcolor="white",
-                bordercolor=colors[prediction],
-                borderwidth=2,
-                borderpad=4
+            # Display the bar chart with the chat bubble above the correct section
+            with metrics.time("figure"):
+                if charts.chart_style == "html":
+                    st.markdown(charts.html_gauge(prediction, stress_level), unsafe_allow_html=True)
+                else:
+                    st.plotly_chart(charts.prediction_figure(prediction, stress_level))
+            st.markdown(
+                f"**Confidence:** {confidence:.1%} "
+                f"({confidence_margin * 100:.1f} percentage points ahead of the next most likely level)"
             )
-        
-            # Display the updated bar chart with the chat bubble
-            st.plotly_chart(fig)
+            with st.expander("Probability of each stress level"):
+                for level, probability in zip(stress_descriptions.values(), probabilities[0]):
+                    st.markdown(f"- {level}: {probability:.1%}")
+            st.caption(f"Model version: {model_version}")
         
             # Decode and display the interpretations of the user's input
             age_desc, bmi_desc, marital_desc, gender_desc, snoring_desc, respiration_desc, body_temp_desc, limb_desc, oxygen_desc, eye_desc, sleep_desc, heart_desc = decode_user_input(
                 age, bmi, marital_status, gender, snoring_rate_val, respiration_rate, body_temperature, limb_movement_val, blood_oxygen, eye_movement_val, sleeping_hours, heart_rate
             )
 
-            def get_status_color(description):
-                critical_keywords = ["Underweight", "Hypoventilation", "Bradycardia", "Hypothermia", "Sleep Deprivation"]
-                warning_keywords = ["Overweight", "Low Oxygen Level", "Severe Hypoxia", "Hyperventilation", "Hypersomnia"]
-                normal_keywords = ["Normal"]
-
-                if any(keyword in description for keyword in critical_keywords):
-                    return "#d32f2f"  # Red
-                elif any(keyword in description for keyword in warning_keywords):
-                    return "#f57c00"  # Orange
-                elif any(keyword in description for keyword in normal_keywords):
-                    return "#388e3c"  # Green
-                else:
-                    return "#616161"  # Grey for unknown or neutral
-
             # Display interpretations with structured layout and accessible colors
             st.markdown("## **📝 Your Input Interpretation:**")
             st.markdown(f"** **")
@@ -572,54 +454,54 @@ if st.button("Predict Stress Level"):
             # col1, col2 = st.columns(2)
 
             with st.container():
-                age_color = get_status_color(age_desc)
+                age_color = interpretation.status_color(age_desc)
                 st.markdown(
                     f"**🧑 Age:** {age} <span style='color:{age_color}'>{age_desc}</span>",
                     unsafe_allow_html=True
                 )
-                bmi_color = get_status_color(bmi_desc)
+                bmi_color = interpretation.status_color(bmi_desc)
                 st.markdown(
                     f"**⚖️ BMI:** {bmi} <span style='color:{bmi_color}'>{bmi_desc}</span>",
                     unsafe_allow_html=True
                 )
                 st.markdown(f"**💍 Marital Status:** {marital_desc}")
                 st.markdown(f"**♂️ Gender:** {gender_desc}")
-                snoring_color = get_status_color(snoring_desc)
+                snoring_color = interpretation.status_color(snoring_desc)
                 st.markdown(
                     f"**😴 Snoring Rate:** {snoring_rate_val} <span style='color:{snoring_color}'>{snoring_desc}</span>",
                     unsafe_allow_html=True
                 )
-                respiration_color = get_status_color(respiration_desc)
+                respiration_color = interpretation.status_color(respiration_desc)
                 st.markdown(
                     f"**🌬️ Respiration Rate:** {respiration_rate} <span style='color:{respiration_color}'>{respiration_desc}</span>",
                     unsafe_allow_html=True
                 )
-                body_temp_color = get_status_color(body_temp_desc)
+                body_temp_color = interpretation.status_color(body_temp_desc)
                 st.markdown(
                     f"**🌡️ Body Temperature:** {body_temperature} °F <span style='color:{body_temp_color}'>{body_temp_desc}</span>",
                     unsafe_allow_html=True
                 )
-                limb_color = get_status_color(limb_desc)
+                limb_color = interpretation.status_color(limb_desc)
                 st.markdown(
                     f"**🦵 Limb Movement:** {limb_movement_val} <span style='color:{limb_color}'>{limb_desc}</span>",
                     unsafe_allow_html=True
                 )
-                oxygen_color = get_status_color(oxygen_desc)
+                oxygen_color = interpretation.status_color(oxygen_desc)
                 st.markdown(
                     f"**🩸 Blood Oxygen:** {blood_oxygen} <span style='color:{oxygen_color}'>{oxygen_desc}</span>",
                     unsafe_allow_html=True
                 )
-                eye_color = get_status_color(eye_desc)
+                eye_color = interpretation.status_color(eye_desc)
                 st.markdown(
                     f"**👁️ Eye Movement:** {eye_movement_val} <span style='color:{eye_color}'>{eye_desc}</span>",
                     unsafe_allow_html=True
                 )
-                sleep_color = get_status_color(sleep_desc)
+                sleep_color = interpretation.status_color(sleep_desc)
                 st.markdown(
                     f"**🛌 Sleeping Hours:** {sleeping_hours} <span style='color:{sleep_color}'>{sleep_desc}</span>",
                     unsafe_allow_html=True
                 )
-                heart_color = get_status_color(heart_desc)
+                heart_color = interpretation.status_color(heart_desc)
                 st.markdown(
                     f"**❤️ Heart Rate:** {heart_rate} <span style='color:{heart_color}'>{heart_desc}</span>",
                     unsafe_allow_html=True
@@ -644,7 +526,7 @@ if st.button("Predict Stress Level"):
                     st.markdown(f"- {rec}")
         
             # Save user input and prediction to history
-            st.session_state.history.append({
+            history_store.append(user_key, {
                 "Age": age,
                 "BMI": bmi,
                 "Marital Status": marital_desc,
@@ -657,7 +539,10 @@ if st.button("Predict Stress Level"):
                 "Eye Movement": eye_movement_val,
                 "Sleeping Hours": sleeping_hours,
                 "Heart Rate": heart_rate,
-                "Stress Level": stress_level
+                "Stress Level": stress_level,
+                "Confidence": confidence,
+                "Confidence Margin": confidence_margin,
+                "Model Version": model_version
             })
 
 # -------------------------------
@@ -671,16 +556,113 @@ if st.button("Show Prediction History", key="show_history_btn"):
 
 # Display prediction history if the button was clicked and history exists
 if st.session_state.show_history:
-    if st.session_state.history:
-        df_history = pd.DataFrame(st.session_state.history)
-        st.write(df_history)
+    with metrics.time("history_render"):
+        history_count = history_store.count(user_key)
+        if history_count:
+            import pandas as pd
+
+            # Only the page being displayed is read from the store
+            page_size = 50
+            page_count = (history_count + page_size - 1) // page_size
+            page = st.number_input(
+                f"Page (1-{page_count}, newest first)", min_value=1, max_value=page_count, value=1, step=1
+            )
+            df_history = pd.DataFrame(history_store.page(user_key, page - 1, page_size), columns=history_columns)
+            st.write(df_history)
         
-        # Create a downloadable CSV file
-        def create_download_link(df, filename="history.csv"):
-            csv = df.to_csv(index=False)
-            b64 = base64.b64encode(csv.encode()).decode()
-            return f'<a href="data:file/csv;base64,{b64}" download="{filename}">📥 Download CSV file</a>'
+            # The export is only generated when the download button is clicked,
+            # and it streams the history from the store in batches
+            from history_export import export_formats, export_history_bytes
+
+            export_format = st.selectbox("Download format", list(export_formats), key="history_export_format")
+            file_name, mime = export_formats[export_format]
+            st.download_button(
+                "📥 Download history",
+                data=functools.partial(export_history_bytes, history_store, user_key, export_format),
+                file_name=file_name,
+                mime=mime,
+                on_click="ignore"
+            )
+        else:
+            st.info("No predictions made yet.")
+
+# -------------------------------
+# 12. Batch Prediction from CSV
+# -------------------------------
+st.markdown("## 📂 **Batch Prediction**")
+st.markdown(
+    "Upload a CSV file with the columns: " + ", ".join(feature_names) + ". "
+    "Every row is scored in one pass; the predicted stress level, its confidence and the probability "
+    "of each level are added as new columns."
+)
+
+uploaded_file = st.file_uploader("Upload CSV", type=["csv"], key="batch_csv")
+if uploaded_file is not None:
+    import pandas as pd
+    from batch_predict import INVALID_LABEL, score_frame
 
-        st.markdown(create_download_link(df_history), unsafe_allow_html=True)
+    try:
+        batch_predictor = get_predictor()
+        df_batch = score_frame(batch_predictor.model, pd.read_csv(uploaded_file),
+                               model_version=batch_predictor.model_version, shadow=shadow_scorer, confidence=True)
+    except ValueError as e:
+        st.error(f"**Error:** {e}")
     else:
-        st.info("No predictions made yet.")
+        invalid_rows = int((df_batch["Stress Level"] == INVALID_LABEL).sum())
+        if invalid_rows:
+            st.warning(f"{invalid_rows} row(s) have values outside the allowed ranges and were not scored.")
+        st.write(df_batch.head(100))
+        st.download_button(
+            "📥 Download scored CSV",
+            data=df_batch.to_csv(index=False),
+            file_name="stress_predictions.csv",
+            mime="text/csv"
+        )
+
+# -------------------------------
+# 13. Startup Profile
+# -------------------------------
+if profile_startup:
+    if predictor_future.done():
+        startup_timings["model load (background)"] = predictor_future.result().load_seconds
+    startup_timings["script total"] = sum(
+        seconds for step, seconds in startup_timings.items() if step != "model load (background)"
+    ) + (time.perf_counter() - _step_start)
+    print("Startup profile: " + ", ".join(f"{step}={seconds * 1000:.1f}ms" for step, seconds in startup_timings.items()),
+          file=sys.stderr)
+    with st.sidebar.expander("⏱️ Startup profile"):
+        for step, seconds in startup_timings.items():
+            st.markdown(f"**{step}:** {seconds * 1000:.1f} ms")
+        if not predictor_future.done():
+            st.markdown("**model load (background):** still running")
+
+# -------------------------------
+# 14. Admin Metrics
+# -------------------------------
+# Open the app with ?admin=1 to see stage latencies and counters of this server process.
+# With STRESS_METRICS_FILE set they are also written there in Prometheus text format.
+metrics_file = os.environ.get("STRESS_METRICS_FILE")
+if metrics_file:
+    metrics.write_prometheus(metrics_file, min_interval=15)
+
+if st.query_params.get("admin") == "1":
+    import pandas as pd
+
+    st.markdown("## 🛠️ **Admin: Metrics**")
+    metrics_summary = metrics.summary()
+    if metrics_summary["timings"]:
+        st.markdown("**Stage latencies (ms, last 1000 calls per stage)**")
+        st.dataframe(pd.DataFrame.from_dict(metrics_summary["timings"], orient="index").round(3))
+    st.markdown("**Counters**")
+    st.dataframe(pd.DataFrame(list(metrics_summary["counters"].items()), columns=["Counter", "Value"]))
+    if predictor_future.done():
+        st.markdown("**Prediction cache:** " + ", ".join(
+            f"{key}={value:.2f}" if isinstance(value, float) else f"{key}={value}"
+            for key, value in predictor_future.result().cache.stats().items()
+        ))
+    st.download_button(
+        "📥 Download Prometheus metrics",
+        data=metrics.prometheus_text(),
+        file_name="stress_metrics.prom",
+        mime="text/plain"
+    )
@@ -0,0 +1,128 @@
+"""Score a whole CSV of inputs with the stress model.
+
+Usage:
+    python -m batch_predict input.csv output.csv [--model gradient_boosting_model.pkl] [--interpret] [--recommend] [--errors] [--confidence]
+
+The input must contain the 12 ``feature_names`` columns.  Marital Status and
+Gender may be given either as 0/1 or as the UI options (Yes/No, Male/Female).
+Blank or missing Snoring Rate, Limb Movement and Eye Movement values are
+treated as 0, same as the sidebar.  Rows failing the checks in validation.py
+are not scored and get the label ``Invalid input``; ``--errors`` adds an
+``Invalid Fields`` column naming every bad field of such rows.
+``--interpret`` adds the ``<feature> Interpretation`` band columns the app
+shows for a single prediction, and ``--recommend`` adds one
+``<group> Recommendation`` column of rule IDs per recommendation group.
+``--confidence`` adds the probability of the predicted level
+(``Confidence``), its lead over the runner-up (``Confidence Margin``) and one
+``P(<level>)`` column per stress level; they come from the same pass over the
+model as the labels.
+Every output row records the ``Model Version`` that scored it.
+"""
+import argparse
+import sys
+import time
+
+import numpy as np
+import pandas as pd
+
+from interpretation import interpret_frame
+from metrics import metrics
+from recommendations import recommend_frame
+from model_registry import resolve_model
+from shadow import CLOSE_TIMEOUT, shadow_for
+from stress_model import describe_predictions, feature_names, load_model, predict_with_confidence, stress_descriptions
+from validation import validate_frame
+from worker_pool import WorkerPool
+
+INVALID_LABEL = "Invalid input"
+
+probability_columns = [f"P({label})" for label in stress_descriptions.values()]
+
+
+def score_frame(model, df, chunk_size=100_000, interpret=False, recommend=False, errors=False,
+                model_version=None, shadow=None, confidence=False):
+    """Return ``df`` with a ``Stress Level`` column (and optionally interpretations,
+    recommendation rule IDs, the names of the invalid fields, the model version and
+    the confidence columns) added.
+
+    With a ``shadow.ShadowScorer`` the valid rows are also queued for the candidate model.
+    """
+    X, validation = validate_frame(df)
+    valid = validation.valid
+
+    labels = np.full(len(X), INVALID_LABEL, dtype=object)
+    # Invalid rows have no probabilities
+    probabilities = np.full((len(X), len(stress_descriptions)), np.nan)
+    margins = np.full(len(X), np.nan)
+    if valid.any():
+        start = time.perf_counter()
+        predictions, probabilities[valid], margins[valid] = predict_with_confidence(model, X[valid], chunk_size)
+        seconds = time.perf_counter() - start
+        metrics.record("batch_predict", seconds)
+        metrics.increment("predictions", int(valid.sum()))
+        labels[valid] = describe_predictions(predictions)
+        if shadow is not None:
+            shadow.submit(X[valid], predictions, model_version, seconds)
+
+    result = df.copy()
+    result["Stress Level"] = labels
+    if confidence:
+        # fmax skips NaN, so invalid rows stay NaN without a warning
+        result["Confidence"] = np.fmax.reduce(probabilities, axis=1)
+        result["Confidence Margin"] = margins
+        result[probability_columns] = probabilities
+    if model_version is not None:
+        result["Model Version"] = model_version
+    if errors:
+        result["Invalid Fields"] = validation.error_fields()
+    if interpret or recommend:
+        features = pd.DataFrame(X, columns=feature_names, index=df.index)
+        extra = []
+        if interpret:
+            extra.append(interpret_frame(features))
+        if recommend:
+            extra.append(recommend_frame(features))
+        result = pd.concat([result, *extra], axis=1)
+    return result
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Batch stress level prediction from a CSV file.")
+    parser.add_argument("input", help="CSV file with the 12 feature columns")
+    parser.add_argument("output", help="where to write the scored CSV")
+    parser.add_argument("--model", help="path to the trained model (default: the active registry version)")
+    parser.add_argument("--workers", type=int, default=0,
+                        help="predict in this many worker processes (default: in this process)")
+    parser.add_argument("--chunk-size", type=int, default=100_000, help="rows per model call")
+    parser.add_argument("--interpret", action="store_true", help="add the interpretation band columns")
+    parser.add_argument("--recommend", action="store_true", help="add the recommendation rule ID columns")
+    parser.add_argument("--errors", action="store_true", help="add an Invalid Fields column naming the bad inputs")
+    parser.add_argument("--confidence", action="store_true",
+                        help="add the Confidence, Confidence Margin and per-level probability columns")
+    parser.add_argument("--shadow-model", help="registry version or model file to shadow score against, see shadow.py")
+    args = parser.parse_args(argv)
+
+    path, version = resolve_model(args.model)
+    model = WorkerPool(path, args.workers) if args.workers > 0 else load_model(path)
+    start = time.perf_counter()
+    df = pd.read_csv(args.input)
+    shadow = shadow_for(args.shadow_model) if args.shadow_model else None
+    try:
+        result = score_frame(model, df, args.chunk_size, args.interpret, args.recommend, args.errors, version,
+                             shadow, args.confidence)
+        # Written before waiting for the shadow scorer, which must not delay the output
+        result.to_csv(args.output, index=False)
+        elapsed = time.perf_counter() - start
+    finally:
+        if args.workers > 0:
+            model.close()
+        if shadow is not None:
+            shadow.close(CLOSE_TIMEOUT)
+
+    invalid = int((result["Stress Level"] == INVALID_LABEL).sum())
+    print(f"Scored {len(result)} rows in {elapsed:.2f}s ({invalid} invalid)", file=sys.stderr)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,186 @@
+"""Benchmark the inference path.
+
+Usage:
+    python -m benchmark [--out bench.json] [--baseline old.json] [--threshold 0.25]
+
+Measures, on seeded random inputs inside the ranges the app accepts:
+
+* cold model load, in a fresh Python process (imports included);
+* ``model.predict`` for batch sizes from 1 to 1M rows;
+* input validation, the interpretation/recommendation helpers for one person
+  and for a 100k-row batch;
+* building the Plotly figure (first build and cached) and the HTML gauge.
+
+Every benchmark is timed with ``timeit`` (auto-ranged loop count, best of
+``--repeat``) and the results are written as JSON together with the commit,
+library versions and model.  With ``--baseline`` the run is compared to an
+earlier JSON file and the exit status is 1 if any benchmark got slower by
+more than ``--threshold`` (0.25 = 25%).
+"""
+import argparse
+import json
+import os
+import platform
+import subprocess
+import sys
+import time
+import timeit
+
+import numpy as np
+
+from compiled_model import random_inputs
+from stress_model import feature_names, load_model, model_path
+
+default_batch_sizes = [1, 10, 100, 1_000, 10_000, 100_000, 1_000_000]
+
+
+def measure(func, repeat=3):
+    """Seconds per call of ``func``: best and median of ``repeat`` auto-ranged samples."""
+    timer = timeit.Timer(func)
+    number, first = timer.autorange()
+    # The autorange run itself counts as the first sample
+    samples = [first] + timer.repeat(repeat - 1, number) if repeat > 1 else [first]
+    per_call = np.array(samples) / number
+    return {"best": float(per_call.min()), "median": float(np.median(per_call)), "loops": number,
+            "repeat": len(samples)}
+
+
+def cold_load_seconds(path, compiled):
+    """Time to import the model code and load ``path`` in a fresh interpreter."""
+    return cold_run_seconds(f"from stress_model import load_model\nload_model({path!r}, compiled={compiled!r})")
+
+
+def cold_run_seconds(statements):
+    """Time to run ``statements`` (imports included) in a fresh interpreter."""
+    code = f"import time; start = time.perf_counter()\n{statements}\nprint(time.perf_counter() - start)"
+    env = dict(os.environ, PYTHONPATH=os.pathsep.join(filter(None, [os.getcwd(), os.environ.get("PYTHONPATH")])),
+               PYTHONWARNINGS="ignore")
+    output = subprocess.run([sys.executable, "-c", code], capture_output=True, text=True, check=True, env=env)
+    return float(output.stdout.strip().splitlines()[-1])
+
+
+def git_commit():
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True,
+                              check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def run_benchmarks(path=model_path, compiled=False, batch_sizes=default_batch_sizes, repeat=3, seed=0, log=None):
+    import pandas as pd
+
+    import charts
+    import interpretation
+    import recommendations
+    from validation import validate_matrix
+
+    results = {}
+
+    def record(name, func, rows=1):
+        result = measure(func, repeat)
+        result["rows"] = rows
+        results[name] = result
+        if log is not None:
+            log(name, result)
+
+    samples = [cold_load_seconds(path, compiled) for _ in range(repeat)]
+    results["load_model_cold"] = {"best": min(samples), "median": float(np.median(samples)), "loops": 1,
+                                  "repeat": repeat, "rows": 0}
+    if log is not None:
+        log("load_model_cold", results["load_model_cold"])
+
+    model = load_model(path, compiled=compiled)
+    X_all = random_inputs(max(batch_sizes), seed)
+    for size in batch_sizes:
+        X = X_all[:size]
+        record(f"predict_{size}", lambda: model.predict(X), size)
+
+    row = X_all[0]
+    values = dict(zip(feature_names, row))
+    record("validate_1", lambda: validate_matrix(row))
+    record("describe_1", lambda: [interpretation.describe(name, values[name]) for name in feature_names])
+    record("recommend_1", lambda: recommendations.recommend(values))
+
+    frame = pd.DataFrame(X_all[:100_000], columns=feature_names)
+    record("validate_100000", lambda: validate_matrix(X_all[:100_000]), 100_000)
+    record("interpret_frame_100000", lambda: interpretation.interpret_frame(frame), 100_000)
+    record("recommend_frame_100000", lambda: recommendations.recommend_frame(frame), 100_000)
+
+    def first_figure():
+        charts.base_figure.cache_clear()
+        charts.prediction_figure(2, "Moderate Stress")
+
+    record("figure_first", first_figure)
+    record("figure_cached", lambda: charts.prediction_figure(2, "Moderate Stress"))
+    record("html_gauge", lambda: charts.html_gauge(2, "Moderate Stress"))
+    return results
+
+
+def compare(results, baseline, threshold):
+    """Names of the benchmarks whose median got slower than ``baseline`` by more than ``threshold``."""
+    regressions = []
+    for name, result in results.items():
+        before = baseline.get(name)
+        if before and before["median"] > 0 and result["median"] / before["median"] > 1 + threshold:
+            regressions.append((name, before["median"], result["median"]))
+    return regressions
+
+
+def print_result(name, result):
+    rate = f", {result['rows'] / result['median']:,.0f} rows/s" if result["rows"] > 1 else ""
+    print(f"{name:<24} {result['median'] * 1000:12.4f} ms{rate}", file=sys.stderr)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark model loading, prediction and the app helpers.")
+    parser.add_argument("--model", default=model_path, help="path to the trained model")
+    parser.add_argument("--compiled", action="store_true", help="benchmark the compiled evaluator instead of sklearn")
+    parser.add_argument("--sizes", default=",".join(map(str, default_batch_sizes)),
+                        help="comma separated batch sizes for model.predict")
+    parser.add_argument("--repeat", type=int, default=3, help="timed samples per benchmark")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--out", default="bench.json", help="where to write the JSON results")
+    parser.add_argument("--baseline", help="earlier JSON results to compare against")
+    parser.add_argument("--threshold", type=float, default=0.25,
+                        help="allowed slowdown against the baseline, as a fraction")
+    args = parser.parse_args(argv)
+
+    import sklearn
+
+    batch_sizes = [int(size) for size in args.sizes.split(",") if size]
+    results = run_benchmarks(args.model, args.compiled, batch_sizes, args.repeat, args.seed, log=print_result)
+    report = {
+        "meta": {
+            "commit": git_commit(),
+            "created_at": time.strftime("%Y-%m-%dT%H:%M:%S%z"),
+            "model": "compiled" if args.compiled else "sklearn",
+            "python": platform.python_version(),
+            "numpy": np.__version__,
+            "sklearn": sklearn.__version__,
+            "machine": platform.machine(),
+            "processor": platform.processor(),
+        },
+        "results": results,
+    }
+    with open(args.out, "w") as f:
+        json.dump(report, f, indent=2)
+    print(f"Wrote {args.out}", file=sys.stderr)
+
+    if args.baseline:
+        with open(args.baseline) as f:
+            baseline = json.load(f)
+        if baseline["meta"].get("model") != report["meta"]["model"]:
+            print("Warning: baseline was run with a different model evaluator.", file=sys.stderr)
+        regressions = compare(results, baseline["results"], args.threshold)
+        for name, before, after in regressions:
+            print(f"REGRESSION {name}: {before * 1000:.4f} ms -> {after * 1000:.4f} ms "
+                  f"(+{(after / before - 1) * 100:.0f}%)", file=sys.stderr)
+        if regressions:
+            return 1
+        print(f"No regressions over {args.threshold:.0%} against {args.baseline}", file=sys.stderr)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
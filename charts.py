@@ -0,0 +1,106 @@
+"""Stress level chart shown after a prediction.
+
+The five coloured bands never change, so the Plotly figure for them is built
+once per process (``base_figure``) and each prediction only adds its
+annotation (``prediction_figure``).
+
+``html_gauge`` draws the same bands with plain HTML/CSS for low-bandwidth
+deployments; it is a few hundred bytes instead of a Plotly figure plus the
+Plotly JS bundle.  Pick it with ``STRESS_CHART_STYLE=html``.
+"""
+import copy
+import os
+from functools import lru_cache
+
+from stress_model import colors, stress_descriptions
+
+chart_style = os.environ.get("STRESS_CHART_STYLE", "plotly")
+
+
+@lru_cache(maxsize=1)
+def base_figure():
+    """The five stacked stress bands as a Plotly figure dict (do not modify)."""
+    import plotly.graph_objects as go
+
+    fig = go.Figure()
+
+    for i in range(5):
+        fig.add_trace(go.Bar(
+            x=[1],
+            y=[0],
+            orientation='h',
+            name=stress_descriptions[i],
+            marker_color=colors[i],
+            width=0.6,
+            showlegend=False
+        ))
+
+    fig.update_layout(
+        barmode='stack',
+        xaxis=dict(
+            tickvals=[0, 1, 2, 3, 4],
+            ticktext=["No Stress", "Low Stress", "Moderate Stress", "High Stress", "Max Stress"],
+            showgrid=False,
+            zeroline=False
+        ),
+        yaxis=dict(showticklabels=False, showgrid=False),
+        plot_bgcolor="white",
+        margin=dict(l=20, r=20, t=20, b=20),
+        height=250,
+        width=800
+    )
+    return fig.to_dict()
+
+
+def prediction_annotation(prediction, stress_level):
+    return dict(
+        x=prediction + 0.5,  # Position the chat bubble based on the prediction
+        y=0.5,
+        text=f"<b>{stress_level}</b>",
+        showarrow=True,
+        arrowhead=2,
+        ax=0,
+        ay=-40,
+        font=dict(size=15, color="black"),
+        align="center",
+        bgcolor="white",
+        bordercolor=colors[prediction],
+        borderwidth=2,
+        borderpad=4
+    )
+
+
+def prediction_figure(prediction, stress_level):
+    """Base figure plus the chat bubble for ``prediction``.
+
+    Only the layout is copied; the cached traces are shared.
+    """
+    base = base_figure()
+    layout = copy.copy(base["layout"])
+    layout["annotations"] = [prediction_annotation(prediction, stress_level)]
+    return {"data": base["data"], "layout": layout}
+
+
+def html_gauge(prediction, stress_level):
+    """Plain HTML/CSS version of the chart."""
+    bands = "".join(
+        f"<div style='flex:1;background:{color};height:36px;"
+        f"{'outline:3px solid #212121;outline-offset:-3px;' if i == prediction else ''}'></div>"
+        for i, color in enumerate(colors)
+    )
+    labels = "".join(
+        f"<div style='flex:1;text-align:center;font-size:12px;"
+        f"{'font-weight:bold;' if i == prediction else ''}'>{stress_descriptions[i]}</div>"
+        for i in range(len(colors))
+    )
+    marker_left = (prediction + 0.5) * 100 / len(colors)
+    return (
+        "<div style='max-width:800px;margin:20px auto;position:relative;padding-top:44px'>"
+        f"<div style='position:absolute;top:0;left:{marker_left}%;transform:translateX(-50%);"
+        f"background:white;border:2px solid {colors[prediction]};border-radius:4px;padding:4px 8px;"
+        f"font-size:15px;white-space:nowrap'><b>{stress_level}</b> &#9660;</div>"
+        f"<div style='display:flex'>{bands}</div>"
+        f"<div style='display:flex;margin-top:4px'>{labels}</div>"
+        "</div>"
+    )
+
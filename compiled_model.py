@@ -0,0 +1,325 @@
+"""Array-based evaluator for the trained GradientBoostingClassifier.
+
+``CompiledGradientBoosting.from_sklearn(model)`` flattens the ``tree_`` of
+every estimator into a few contiguous NumPy arrays:
+
+* ``split_feature`` / ``split_threshold``: every distinct (feature, threshold)
+  split used anywhere in the ensemble,
+* ``tree_splits``: for each tree, the split used at each internal node of the
+  tree laid out as a perfect binary tree (-1 for padding nodes, which always
+  go left),
+* ``leaf_value``: the leaf values of each padded tree, times the learning rate.
+
+Prediction evaluates every distinct split once for the whole batch, turns the
+split outcomes into a per-tree node code with one matrix product, and looks
+the leaf values up in a precomputed table, so there is no Python-level loop
+over trees or rows.
+
+The arithmetic follows sklearn exactly: inputs are compared as float32, and
+the leaf values are added stage by stage in the same order, so ``predict``
+matches ``model.predict`` bit for bit.  Check it with:
+
+    python -m compiled_model --rows 100000
+"""
+import argparse
+import sys
+import time
+
+import numpy as np
+
+# Rows evaluated together; keeps the per-chunk work arrays in cache
+CHUNK_ROWS = 512
+
+# A tree of depth 3 has 7 internal nodes, i.e. 128 possible node codes.
+# Deeper trees would need exponentially larger leaf tables.
+MAX_DEPTH = 3
+
+
+def _round_down_float32(threshold):
+    """Largest float32 ``t32`` with ``t32 <= threshold``.
+
+    For a float32 input ``x``, ``x <= threshold`` is then the same as ``x <= t32``.
+    """
+    t32 = threshold.astype(np.float32)
+    too_big = t32.astype(np.float64) > threshold
+    t32[too_big] = np.nextafter(t32[too_big], np.float32(-np.inf))
+    return t32
+
+
+class CompiledGradientBoosting:
+    def __init__(self, split_feature, split_threshold, tree_splits, leaf_value,
+                 init_raw, classes, n_stages, code_weights=None, leaf_table=None):
+        self.split_feature = np.asarray(split_feature, dtype=np.intp)
+        self.split_threshold = np.asarray(split_threshold, dtype=np.float32)
+        self.tree_splits = np.asarray(tree_splits, dtype=np.intp)
+        leaf_value = np.asarray(leaf_value)
+        # float32 leaf values (see compress_model.py) are kept, which halves the lookup table
+        self.leaf_value = leaf_value if leaf_value.dtype == np.float32 else np.asarray(leaf_value, dtype=np.float64)
+        self.init_raw = np.asarray(init_raw, dtype=np.float64)
+        self.classes_ = np.asarray(classes)
+        self.n_stages = int(n_stages)
+        self.n_classes = len(self.init_raw)
+        self.n_trees, n_internal = self.tree_splits.shape
+        self.depth = int(np.log2(n_internal + 1))
+        if code_weights is not None and leaf_table is not None:
+            # Exported with the arrays (see model_artifact.py); memory-mapped tables stay shared
+            self._code_weights, self._leaf_table = code_weights, leaf_table
+        else:
+            self._build_tables()
+
+    def _build_tables(self):
+        n_internal = self.tree_splits.shape[1]
+        n_codes = 2 ** n_internal
+
+        # Row i of the weights adds 2**node for every node of every tree that
+        # uses split i, so goes_right @ weights gives each tree's node code
+        # (bit set = went right).  A last, always-one row adds the offset of
+        # the tree's block in the flattened leaf table.
+        self._code_weights = np.zeros((len(self.split_feature) + 1, self.n_trees), dtype=np.float32)
+        trees, nodes = np.nonzero(self.tree_splits >= 0)
+        np.add.at(self._code_weights, (self.tree_splits[trees, nodes], trees), 2.0 ** nodes)
+        self._code_weights[-1] = np.arange(self.n_trees) * n_codes
+
+        # Leaf reached by each possible code, walking the padded tree
+        codes = np.arange(n_codes)
+        node = np.zeros(n_codes, dtype=np.intp)
+        for _ in range(self.depth):
+            node = 2 * node + 1 + ((codes >> node) & 1)
+        self._leaf_table = self.leaf_value[:, node - n_internal].ravel()
+
+    @classmethod
+    def from_sklearn(cls, model):
+        estimators = model.estimators_
+        n_stages, n_trees_per_stage = estimators.shape
+        depth = max(estimator.tree_.max_depth for estimator in estimators.ravel())
+        if depth > MAX_DEPTH:
+            raise ValueError(f"Compiled evaluator supports trees up to depth {MAX_DEPTH}, got {depth}.")
+        n_internal = 2 ** depth - 1
+        n_trees = n_stages * n_trees_per_stage
+
+        split_ids = {}
+        split_features, split_thresholds = [], []
+        tree_splits = np.full((n_trees, n_internal), -1, dtype=np.intp)
+        leaf_value = np.zeros((n_trees, 2 ** depth), dtype=np.float64)
+
+        # Trees are stored stage-major: tree t = stage * K + k
+        for t, estimator in enumerate(estimators.ravel()):
+            tree = estimator.tree_
+            thresholds = _round_down_float32(tree.threshold)
+            stack = [(0, 0, 0)]
+            while stack:
+                node, slot, level = stack.pop()
+                if level == depth:
+                    leaf_value[t, slot - n_internal] = model.learning_rate * tree.value[node, 0, 0]
+                    continue
+                if tree.children_left[node] == -1:
+                    # Leaf above full depth: repeat it under both children of a padding node
+                    stack.append((node, 2 * slot + 1, level + 1))
+                    stack.append((node, 2 * slot + 2, level + 1))
+                    continue
+                key = (int(tree.feature[node]), float(thresholds[node]))
+                if key not in split_ids:
+                    split_ids[key] = len(split_features)
+                    split_features.append(key[0])
+                    split_thresholds.append(key[1])
+                tree_splits[t, slot] = split_ids[key]
+                stack.append((tree.children_left[node], 2 * slot + 1, level + 1))
+                stack.append((tree.children_right[node], 2 * slot + 2, level + 1))
+
+        init_raw = model._raw_predict_init(np.zeros((1, model.n_features_in_), dtype=np.float32))[0]
+        return cls(
+            split_feature=split_features,
+            split_threshold=split_thresholds,
+            tree_splits=tree_splits,
+            leaf_value=leaf_value,
+            init_raw=init_raw,
+            classes=model.classes_,
+            n_stages=n_stages,
+        )
+
+    def arrays(self):
+        """All arrays needed to rebuild the evaluator, e.g. for saving to disk.
+
+        Includes the lookup tables derived from the tree arrays, so a loaded
+        evaluator does not have to build them again.
+        """
+        return {
+            "split_feature": self.split_feature,
+            "split_threshold": self.split_threshold,
+            "tree_splits": self.tree_splits,
+            "leaf_value": self.leaf_value,
+            "init_raw": self.init_raw,
+            "classes": self.classes_,
+            "code_weights": self._code_weights,
+            "leaf_table": self._leaf_table,
+        }
+
+    def stage_slice(self, start, stop):
+        """A ``CompiledGradientBoosting`` of stages ``[start, stop)`` only.
+
+        Its initial scores are zero, so its raw scores are what those stages
+        add.  It evaluates just the splits its trees use and has lookup tables
+        of its own, sized for them.
+        """
+        trees = np.arange(start * self.n_classes, stop * self.n_classes)
+        tree_splits = self.tree_splits[trees]
+        used = np.unique(tree_splits[tree_splits >= 0])
+        renumbered = np.full(len(self.split_feature), -1, dtype=np.intp)
+        renumbered[used] = np.arange(len(used))
+        return CompiledGradientBoosting(
+            split_feature=self.split_feature[used],
+            split_threshold=self.split_threshold[used],
+            tree_splits=np.where(tree_splits >= 0, renumbered[tree_splits], -1),
+            leaf_value=self.leaf_value[trees],
+            init_raw=np.zeros_like(self.init_raw),
+            classes=self.classes_,
+            n_stages=stop - start,
+        )
+
+    def split_outcomes(self, X, splits=None):
+        """1.0 where a row goes right at a split, shape (rows, splits + 1); the last column is always 1.
+
+        With ``splits``, only the columns of those splits (and the last).
+        """
+        X = np.asarray(X, dtype=np.float32)
+        if splits is None:
+            features, thresholds = self.split_feature, self.split_threshold
+        else:
+            features, thresholds = self.split_feature[splits], self.split_threshold[splits]
+        goes_right = np.ones((len(X), len(features) + 1), dtype=np.float32)
+        # Written as "not <=" so NaN goes right, as in sklearn
+        goes_right[:, :-1] = ~(X[:, features] <= thresholds)
+        return goes_right
+
+    def tree_codes(self, outcomes, splits=None):
+        """Node codes of every tree for rows of ``split_outcomes``, shape (rows, trees).
+
+        Codes are sums of the outcomes' weights, so with ``splits`` (indices
+        into the columns of ``split_outcomes``) and ``outcomes`` holding only
+        those columns, the result is their share of the codes.  Changes of
+        outcome give the change of the codes; the sums are of small integers
+        and exact in float32.
+        """
+        weights = self._code_weights if splits is None else self._code_weights[splits]
+        return outcomes @ weights
+
+    def code_leaf_values(self, codes):
+        """Leaf value reached by each code of ``tree_codes``."""
+        return self._leaf_table[np.asarray(codes).astype(np.intp)]
+
+    def tree_contributions(self, X, trees=None):
+        """Leaf value of every tree for every row, shape (trees, rows).
+
+        With ``trees`` (indices, stage-major), only those trees, and only the
+        splits they use are evaluated.
+        """
+        if trees is None:
+            splits, weights = None, self._code_weights
+        else:
+            trees = np.asarray(trees, dtype=np.intp)
+            splits = np.unique(self.tree_splits[trees])
+            splits = splits[splits >= 0]
+            weights = self._code_weights[np.ix_(np.append(splits, len(self.split_feature)), trees)]
+        codes = (weights.T @ self.split_outcomes(X, splits).T).astype(np.intp)
+        return self._leaf_table[codes]
+
+    def _raw_chunk(self, X):
+        n_rows = len(X)
+        contributions = self.tree_contributions(X).reshape(self.n_stages, self.n_classes, n_rows)
+        # Add one stage at a time, the same order as sklearn's predict_stages,
+        # so the sums round exactly the same way
+        if n_rows < 32:
+            acc = np.concatenate([np.broadcast_to(self.init_raw[None, :, None], (1, self.n_classes, n_rows)), contributions])
+            return np.cumsum(acc, axis=0)[-1].T
+        raw = np.repeat(self.init_raw[:, None], n_rows, axis=1)
+        for stage_values in contributions:
+            raw += stage_values
+        return raw.T
+
+    def decision_function(self, X):
+        X = np.asarray(X, dtype=np.float32)
+        if X.ndim == 1:
+            X = X.reshape(1, -1)
+        raw = np.empty((len(X), self.n_classes), dtype=np.float64)
+        for start in range(0, len(X), CHUNK_ROWS):
+            raw[start:start + CHUNK_ROWS] = self._raw_chunk(X[start:start + CHUNK_ROWS])
+        return raw
+
+    def predict(self, X):
+        raw = self.decision_function(X)
+        if self.n_classes == 1:
+            encoded = (raw[:, 0] >= 0).astype(int)
+        else:
+            encoded = np.argmax(raw, axis=1)
+        return self.classes_[encoded]
+
+
+def random_inputs(n_rows, seed=0):
+    """Random inputs inside the ranges the app accepts."""
+    from stress_model import feature_names, feature_ranges
+
+    rng = np.random.default_rng(seed)
+    columns = []
+    for name in feature_names:
+        low, high = feature_ranges[name]
+        if name in ('Age', 'Marital Status', 'Gender'):
+            columns.append(rng.integers(low, high + 1, n_rows).astype(float))
+        else:
+            columns.append(np.round(rng.uniform(low, high, n_rows), 1))
+    return np.column_stack(columns)
+
+
+def boundary_inputs(compiled, seed=0):
+    """Random rows with one feature set exactly on, and just around, each split threshold."""
+    thresholds = compiled.split_threshold
+    values = np.concatenate([
+        thresholds,
+        np.nextafter(thresholds, np.float32(np.inf)),
+        np.nextafter(thresholds, np.float32(-np.inf)),
+    ])
+    features = np.tile(compiled.split_feature, 3)
+    X = random_inputs(len(values), seed)
+    X[np.arange(len(values)), features] = values
+    return X
+
+
+def check_parity(model, compiled, X):
+    """Return the number of rows where ``compiled`` disagrees with ``model``."""
+    expected_raw = model.decision_function(X)
+    if expected_raw.ndim == 1:
+        expected_raw = expected_raw[:, None]
+    raw = compiled.decision_function(X)
+    mismatched = (raw != expected_raw).any(axis=1) | (compiled.predict(X) != model.predict(X))
+    return int(mismatched.sum())
+
+
+def main(argv=None):
+    from stress_model import load_model, model_path
+
+    parser = argparse.ArgumentParser(description="Check the compiled evaluator against model.predict.")
+    parser.add_argument("--model", default=model_path, help="path to the trained model")
+    parser.add_argument("--rows", type=int, default=100_000, help="number of random rows to compare")
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args(argv)
+
+    model = load_model(args.model, compiled=False)
+    compiled = CompiledGradientBoosting.from_sklearn(model)
+    X = random_inputs(args.rows, args.seed)
+
+    mismatches = check_parity(model, compiled, X)
+    print(f"rows: {args.rows}, mismatches: {mismatches}")
+
+    for label, predict in (("sklearn", model.predict), ("compiled", compiled.predict)):
+        start = time.perf_counter()
+        predict(X)
+        batch_seconds = time.perf_counter() - start
+        start = time.perf_counter()
+        for row in X[:200]:
+            predict(row.reshape(1, -1))
+        row_seconds = (time.perf_counter() - start) / min(len(X), 200)
+        print(f"{label}: batch {batch_seconds:.3f}s, single row {row_seconds * 1e6:.0f}us")
+    return 1 if mismatches else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,223 @@
+"""Build smaller variants of the model for memory- and start-up-constrained hosts.
+
+Usage:
+    python -m compress_model [--stages 100,75,50,25] [--out-dir compressed] [--input reference.csv]
+
+Every variant is written as a model artifact (see model_artifact.py), which
+loads without scikit-learn in a few milliseconds, and is made of:
+
+* the first N boosting stages only (``--stages``);
+* collapsed redundant splits: a split whose two subtrees are the same, or
+  whose outcome is fixed by the input ranges the app accepts
+  (``feature_ranges``), is replaced by the subtree that is taken.  This never
+  changes a prediction for a valid input, and fewer distinct splits are left
+  to evaluate;
+* for the ``-f32`` variants, leaf values stored as float32 (thresholds already
+  are, see compiled_model.py), which halves the leaf lookup table.
+
+``report.json`` in ``--out-dir`` lists, for the original pickle and every
+variant, the size on disk, the cold load time in a fresh interpreter, the
+per-row latency of a batch and of a single row and the label agreement with
+the original ``model.predict`` on the reference inputs (``--input``, or
+``--rows`` seeded random rows inside the accepted ranges).
+
+A variant is a different model from the pickle it was derived from, so it is
+never loaded in its place: ``load_model(compiled=True)`` ignores artifacts
+with ``compression`` metadata, even when copied to
+``gradient_boosting_model.arrays``.  Load a variant explicitly with
+``model_artifact.load_artifact(path)``.
+"""
+import argparse
+import json
+import os
+import sys
+
+import numpy as np
+
+from benchmark import cold_load_seconds, cold_run_seconds, measure
+from compiled_model import CompiledGradientBoosting, random_inputs
+from model_artifact import export_artifact, load_artifact
+from stress_model import feature_names, feature_ranges, load_model, model_path
+
+default_out_dir = "compressed"
+
+
+def _subtree(compiled, t, node, leaf_value, ranges):
+    """Tree ``t`` below ``node`` as nested ``(feature, threshold, left, right)``
+    tuples with float leaves, redundant splits collapsed."""
+    n_internal = compiled.tree_splits.shape[1]
+    if node >= n_internal:
+        return float(leaf_value[t, node - n_internal])
+    left = _subtree(compiled, t, 2 * node + 1, leaf_value, ranges)
+    split = compiled.tree_splits[t, node]
+    if split < 0:
+        # Padding node, always goes left
+        return left
+    right = _subtree(compiled, t, 2 * node + 2, leaf_value, ranges)
+    feature = int(compiled.split_feature[split])
+    threshold = compiled.split_threshold[split]
+    low, high = (np.float32(bound) for bound in ranges[feature])
+    if threshold >= high or left == right:
+        return left
+    if threshold < low:
+        return right
+    return (feature, float(threshold), left, right)
+
+
+def _depth(tree):
+    return 1 + max(_depth(tree[2]), _depth(tree[3])) if isinstance(tree, tuple) else 0
+
+
+def _pad(tree, depth, splits, leaves, split_ids, slot=0, level=0):
+    """Lay ``tree`` out as a perfect binary tree, as ``CompiledGradientBoosting.from_sklearn`` does."""
+    n_internal = 2 ** depth - 1
+    if level == depth:
+        leaves[slot - n_internal] = tree
+        return
+    if not isinstance(tree, tuple):
+        # Leaf above full depth: a padding node (-1, always left) with the leaf under both children
+        _pad(tree, depth, splits, leaves, split_ids, 2 * slot + 1, level + 1)
+        _pad(tree, depth, splits, leaves, split_ids, 2 * slot + 2, level + 1)
+        return
+    feature, threshold, left, right = tree
+    splits[slot] = split_ids.setdefault((feature, threshold), len(split_ids))
+    _pad(left, depth, splits, leaves, split_ids, 2 * slot + 1, level + 1)
+    _pad(right, depth, splits, leaves, split_ids, 2 * slot + 2, level + 1)
+
+
+def compress(compiled, n_stages=None, float32=False, ranges=None):
+    """A ``CompiledGradientBoosting`` with the first ``n_stages`` stages of
+    ``compiled``, redundant splits collapsed and, with ``float32``, float32 leaf values."""
+    if ranges is None:
+        ranges = [feature_ranges[name] for name in feature_names]
+    n_stages = compiled.n_stages if n_stages is None else min(n_stages, compiled.n_stages)
+    leaf_value = compiled.leaf_value.astype(np.float32 if float32 else np.float64)
+    # Rounded first, so siblings that became equal in float32 collapse too
+    trees = [_subtree(compiled, t, 0, leaf_value, ranges) for t in range(n_stages * compiled.n_classes)]
+
+    depth = max(1, max(_depth(tree) for tree in trees))
+    split_ids = {}
+    tree_splits = np.full((len(trees), 2 ** depth - 1), -1, dtype=np.intp)
+    leaves = np.zeros((len(trees), 2 ** depth), dtype=leaf_value.dtype)
+    for t, tree in enumerate(trees):
+        _pad(tree, depth, tree_splits[t], leaves[t], split_ids)
+    keys = sorted(split_ids, key=split_ids.get)
+    return CompiledGradientBoosting(
+        split_feature=[feature for feature, _ in keys],
+        split_threshold=np.array([threshold for _, threshold in keys], dtype=np.float32),
+        tree_splits=tree_splits,
+        leaf_value=leaves,
+        init_raw=compiled.init_raw,
+        classes=compiled.classes_,
+        n_stages=n_stages,
+    )
+
+
+def _directory_size(path):
+    return sum(os.path.getsize(os.path.join(path, name)) for name in os.listdir(path))
+
+
+def _memory_bytes(compiled):
+    """Bytes held by the arrays and lookup tables of a loaded evaluator."""
+    return sum(array.nbytes for array in (
+        compiled.split_feature, compiled.split_threshold, compiled.tree_splits, compiled.leaf_value,
+        compiled._code_weights, compiled._leaf_table,
+    ))
+
+
+def _measure(model, X, expected, repeat):
+    batch = measure(lambda: model.predict(X), repeat)
+    row = X[:1]
+    single = measure(lambda: model.predict(row), repeat)
+    return {
+        "batch_us_per_row": batch["median"] / len(X) * 1e6,
+        "single_row_us": single["median"] * 1e6,
+        "agreement": float((model.predict(X) == expected).mean()),
+    }
+
+
+def build_variants(path, stage_counts, out_dir, X, repeat=3, log=None):
+    """Write every variant under ``out_dir`` and return the report rows."""
+    model = load_model(path, compiled=False)
+    compiled = CompiledGradientBoosting.from_sklearn(model)
+    expected = model.predict(X)
+
+    report = [{
+        "name": "original",
+        "path": path,
+        "stages": compiled.n_stages,
+        "splits": len(compiled.split_feature),
+        "leaf_dtype": "float64",
+        "size_bytes": os.path.getsize(path),
+        "cold_load_ms": cold_load_seconds(path, False) * 1000,
+        **_measure(model, X, expected, repeat),
+    }]
+    if log is not None:
+        log(report[-1])
+
+    for n_stages in stage_counts:
+        for float32 in (False, True):
+            name = f"s{n_stages}-{'f32' if float32 else 'f64'}"
+            variant = compress(compiled, n_stages, float32)
+            variant_dir = os.path.join(out_dir, name)
+            export_artifact(variant, path, variant_dir,
+                            compression={"stages": variant.n_stages, "leaf_dtype": str(variant.leaf_value.dtype)})
+            loaded = load_artifact(variant_dir)
+            report.append({
+                "name": name,
+                "path": variant_dir,
+                "stages": variant.n_stages,
+                "splits": len(variant.split_feature),
+                "leaf_dtype": str(variant.leaf_value.dtype),
+                "size_bytes": _directory_size(variant_dir),
+                "memory_bytes": _memory_bytes(loaded),
+                "cold_load_ms": cold_run_seconds(
+                    f"from model_artifact import load_artifact\nload_artifact({variant_dir!r})") * 1000,
+                **_measure(loaded, X, expected, repeat),
+            })
+            if log is not None:
+                log(report[-1])
+    return report
+
+
+def print_row(row):
+    memory = f"{row['memory_bytes'] / 1024:8.0f}" if "memory_bytes" in row else f"{'-':>8}"
+    print(f"{row['name']:<10} {row['stages']:>6} {row['splits']:>6} {row['size_bytes'] / 1024:>8.0f} {memory} "
+          f"{row['cold_load_ms']:>8.0f} {row['batch_us_per_row']:>8.2f} {row['single_row_us']:>8.0f} "
+          f"{row['agreement']:>9.4%}")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Write compressed variants of the model and compare them.")
+    parser.add_argument("--model", default=model_path, help="path to the trained model")
+    parser.add_argument("--stages", default="100,75,50,25", help="comma separated stage counts to keep")
+    parser.add_argument("--out-dir", default=default_out_dir, help="directory for the variants and report.json")
+    parser.add_argument("--input", help="CSV of reference inputs (default: random rows)")
+    parser.add_argument("--rows", type=int, default=100_000, help="random reference rows")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--repeat", type=int, default=3, help="timed samples per measurement")
+    args = parser.parse_args(argv)
+
+    if args.input:
+        import pandas as pd
+        from validation import validate_frame
+
+        X, validation = validate_frame(pd.read_csv(args.input))
+        X = X[validation.valid]
+    else:
+        X = random_inputs(args.rows, args.seed)
+
+    os.makedirs(args.out_dir, exist_ok=True)
+    print(f"{'variant':<10} {'stages':>6} {'splits':>6} {'disk KB':>8} {'mem KB':>8} {'load ms':>8} "
+          f"{'us/row':>8} {'1 row us':>8} {'agreement':>9}")
+    report = build_variants(args.model, [int(n) for n in args.stages.split(",") if n], args.out_dir, X,
+                            args.repeat, log=print_row)
+    report_path = os.path.join(args.out_dir, "report.json")
+    with open(report_path, "w") as f:
+        json.dump({"reference_rows": len(X), "variants": report}, f, indent=2)
+    print(f"Wrote {report_path}", file=sys.stderr)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,289 @@
+"""Early-exit evaluation of the boosting ensemble.
+
+Most rows are clear-cut: after a fraction of the 100 boosting stages one
+class is already far ahead and the remaining stages do not change the label.
+``EarlyExitPredictor`` evaluates the compiled trees (see compiled_model.py)
+one block of stages at a time, only for the rows still undecided, and at the
+end of each block lets a row exit as soon as the gap between its two highest
+raw class scores reaches that checkpoint's threshold.  Rows that never exit
+run every stage and get exactly ``model.predict``'s label.
+
+The thresholds are calibrated offline against the model's
+``staged_decision_function`` on reference inputs (``--input``, e.g. recent
+traffic, or random rows inside the accepted ranges) and saved as JSON next to
+the checksum of the model they were calibrated for:
+
+    python -m early_exit [--input reference.csv] calibrate --agreement 0.999 [--out early_exit.json]
+    python -m early_exit [--input reference.csv] tradeoff [--agreements 0.99,0.995,0.999,0.9999]
+
+Part of the reference rows (``--holdout``) is kept out of the calibration.
+The thresholds are tightened until their agreement with ``model.predict`` on
+those rows reaches the target, and ``calibrate`` fails without writing
+anything if it cannot.  ``tradeoff`` reports, for each target, the held-out
+agreement, the average number of stages per row and the speed-up.
+
+Batch and stream scoring do not use early exit: on this model (100 stages of
+depth-3 trees over 552 distinct splits) rows run about 60 stages at a 0.99
+target, and comparing each block's splits separately costs more than the
+stages saved, so ``tradeoff`` measures no speed-up over one full compiled
+pass.  Run it again for a retrained model before wiring early exit in.
+"""
+import argparse
+import json
+import sys
+import time
+
+import numpy as np
+
+from compiled_model import random_inputs
+from stress_model import load_model, model_path
+
+default_thresholds_path = "early_exit.json"
+
+# Rows evaluated together; bounds the size of the per-block work arrays
+CHUNK_ROWS = 8192
+
+
+def _margin_and_encoded(raw):
+    """Gap between the two highest class scores, and the index of the highest."""
+    if raw.shape[1] == 1:
+        # Binary models score only the positive class; the gap is its distance from 0
+        return 2 * np.abs(raw[:, 0]), (raw[:, 0] >= 0).astype(int)
+    top_two = np.partition(raw, -2, axis=1)[:, -2:]
+    return top_two[:, 1] - top_two[:, 0], np.argmax(raw, axis=1)
+
+
+class EarlyExitPredictor:
+    def __init__(self, compiled, checkpoints, thresholds):
+        """Early-exit evaluation of a ``CompiledGradientBoosting``.
+
+        ``checkpoints`` are the stage counts after which rows may exit and
+        ``thresholds`` the score gap needed at each of them (``inf`` never exits).
+        """
+        if len(checkpoints) != len(thresholds):
+            raise ValueError("Need one threshold per checkpoint.")
+        if list(checkpoints) != sorted(set(checkpoints)) or not 0 < min(checkpoints, default=1) \
+                or max(checkpoints, default=0) >= compiled.n_stages:
+            raise ValueError(f"Checkpoints must be increasing stage counts below {compiled.n_stages}.")
+        self.compiled = compiled
+        self.classes_ = compiled.classes_
+        self.checkpoints = [int(c) for c in checkpoints]
+        self.thresholds = np.asarray(thresholds, dtype=float)
+        bounds = [0, *self.checkpoints, compiled.n_stages]
+        # The stages between two checkpoints, each with only the splits and tables it needs
+        self._blocks = [compiled.stage_slice(start, stop) for start, stop in zip(bounds[:-1], bounds[1:])]
+
+    def staged_exit(self, X):
+        """``(raw, stages)``: the raw scores each row exited with and how many stages it ran."""
+        X = np.asarray(X, dtype=np.float32)
+        if X.ndim == 1:
+            X = X.reshape(1, -1)
+        raw = np.empty((len(X), self.compiled.n_classes), dtype=np.float64)
+        stages = np.empty(len(X), dtype=np.intp)
+        for start in range(0, len(X), CHUNK_ROWS):
+            chunk = X[start:start + CHUNK_ROWS]
+            raw[start:start + len(chunk)], stages[start:start + len(chunk)] = self._staged_exit_chunk(chunk)
+        return raw, stages
+
+    def _staged_exit_chunk(self, X):
+        n_classes = self.compiled.n_classes
+        # Scores as (classes, rows), the layout of the tree contributions
+        raw = np.repeat(self.compiled.init_raw[:, None], len(X), axis=1)
+        stages = np.full(len(X), self.compiled.n_stages, dtype=np.intp)
+        active = np.arange(len(X))
+        done = 0
+        for i, block in enumerate(self._blocks):
+            everyone = len(active) == len(X)
+            contributions = block.tree_contributions(X if everyone else X[active])
+            scores = raw.copy() if everyone else raw[:, active]
+            # Add one stage at a time, in sklearn's order, so full runs match it exactly
+            for stage_values in contributions.reshape(block.n_stages, n_classes, len(active)):
+                scores += stage_values
+            raw[:, active] = scores
+            done += block.n_stages
+            if i == len(self.checkpoints):
+                break
+            margin, _ = _margin_and_encoded(scores.T)
+            exits = margin >= self.thresholds[i]
+            stages[active[exits]] = done
+            active = active[~exits]
+            if not len(active):
+                break
+        return raw.T, stages
+
+    def decision_function(self, X):
+        return self.staged_exit(X)[0]
+
+    def predict(self, X):
+        return self.classes_[_margin_and_encoded(self.decision_function(X))[1]]
+
+
+def calibrate(staged_raw, final_raw, target_agreement):
+    """Thresholds for the checkpoints of ``staged_raw`` (one raw score array per checkpoint).
+
+    The disagreements ``1 - target_agreement`` allows on the sample are split
+    evenly over the checkpoints; at each one the threshold is the lowest gap
+    above which the rows still running cost no more than their share.
+    """
+    _, final = _margin_and_encoded(final_raw)
+    budget = (1 - target_agreement) * len(final) / max(len(staged_raw), 1)
+    active = np.ones(len(final), dtype=bool)
+    thresholds = []
+    for raw in staged_raw:
+        margin, encoded = _margin_and_encoded(raw)
+        order = np.argsort(-margin[active], kind="stable")
+        wrong = np.cumsum((encoded != final)[active][order])
+        over = np.flatnonzero(wrong > budget)
+        if over.size:
+            # Just above the gap of the first row over budget, so it and its ties keep running
+            threshold = float(np.nextafter(margin[active][order][over[0]], np.inf))
+        else:
+            threshold = 0.0
+        thresholds.append(threshold)
+        active &= margin < threshold
+    return thresholds
+
+
+def fit_thresholds(compiled, checkpoints, staged_raw, final_raw, X_check, expected_check, target_agreement,
+                   tries=6):
+    """``(predictor, agreement)`` calibrated on one sample and checked on another.
+
+    Thresholds fitted to a sample agree with it at the target by
+    construction but less on new rows, so they are calibrated for ever
+    stricter targets (halving the disagreements allowed) until their
+    agreement with ``expected_check``, the encoded final labels of
+    ``X_check``, reaches ``target_agreement``.  The last try is returned if
+    none does.
+    """
+    for attempt in range(tries):
+        target = 1 - (1 - target_agreement) / 2 ** attempt
+        predictor = EarlyExitPredictor(compiled, checkpoints, calibrate(staged_raw, final_raw, target))
+        raw, _ = predictor.staged_exit(X_check)
+        agreement = float((_margin_and_encoded(raw)[1] == expected_check).mean())
+        if agreement >= target_agreement:
+            break
+    return predictor, agreement
+
+
+def split_sample(X, holdout, seed=0):
+    """``(fit, check)``: ``X`` shuffled and split, ``holdout`` of the rows going to ``check``."""
+    order = np.random.default_rng(seed).permutation(len(X))
+    n_check = int(round(len(X) * holdout))
+    return X[order[n_check:]], X[order[:n_check]]
+
+
+def staged_scores(model, X, checkpoints):
+    """Raw scores of sklearn ``model`` after each checkpoint stage count, and after all stages."""
+    wanted = set(checkpoints)
+    staged = []
+    for stage, raw in enumerate(model.staged_decision_function(X), start=1):
+        raw = raw.reshape(len(X), -1)
+        if stage in wanted:
+            staged.append(raw.copy())
+    return staged, raw
+
+
+def save_thresholds(path, predictor, model_file, **info):
+    from prediction_cache import file_sha256
+
+    with open(path, "w") as f:
+        json.dump({
+            "model_sha256": file_sha256(model_file),
+            "checkpoints": predictor.checkpoints,
+            "thresholds": predictor.thresholds.tolist(),
+            **info,
+        }, f, indent=2)
+
+
+def load_early_exit(path=model_path, thresholds_path=default_thresholds_path):
+    """An ``EarlyExitPredictor`` for the model at ``path`` with saved thresholds.
+
+    Raises ValueError if the thresholds were calibrated for a different model.
+    """
+    from prediction_cache import file_sha256
+
+    with open(thresholds_path) as f:
+        saved = json.load(f)
+    if saved.get("model_sha256") != file_sha256(path):
+        raise ValueError(f"{thresholds_path} was calibrated for a different model than {path}.")
+    return EarlyExitPredictor(load_model(path, compiled=True), saved["checkpoints"], saved["thresholds"])
+
+
+def _timed(func, X):
+    start = time.perf_counter()
+    result = func(X)
+    return result, time.perf_counter() - start
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Calibrate early-exit thresholds and measure the trade-off.")
+    parser.add_argument("--model", default=model_path, help="path to the trained model")
+    parser.add_argument("--every", type=int, default=10, help="stages between exit checkpoints")
+    parser.add_argument("--input", help="CSV of reference inputs, e.g. recent traffic (default: random rows)")
+    parser.add_argument("--rows", type=int, default=100_000, help="random rows when there is no --input")
+    parser.add_argument("--holdout", type=float, default=0.3,
+                        help="fraction of the rows held out to check the thresholds on")
+    parser.add_argument("--seed", type=int, default=0, help="seed of the random rows and of the split")
+    commands = parser.add_subparsers(dest="command", required=True)
+    calibrate_parser = commands.add_parser("calibrate", help="calibrate and save thresholds")
+    calibrate_parser.add_argument("--agreement", type=float, default=0.999,
+                                  help="minimum agreement with model.predict on the held-out rows")
+    calibrate_parser.add_argument("--out", default=default_thresholds_path)
+    tradeoff = commands.add_parser("tradeoff", help="report speed and agreement for several targets")
+    tradeoff.add_argument("--agreements", default="0.99,0.995,0.999,0.9999",
+                          help="comma separated target agreement rates")
+    args = parser.parse_args(argv)
+    if not 0 < args.holdout < 1:
+        parser.error("--holdout must be between 0 and 1")
+
+    if args.input:
+        import pandas as pd
+        from validation import validate_frame
+
+        X, validation = validate_frame(pd.read_csv(args.input))
+        X = X[validation.valid]
+    else:
+        X = random_inputs(args.rows, args.seed)
+    # The thresholds are judged on rows they were not fitted to
+    X_fit, X_check = split_sample(X, args.holdout, args.seed)
+    if not len(X_fit) or not len(X_check):
+        print("Not enough reference rows to calibrate and check on.", file=sys.stderr)
+        return 1
+
+    model = load_model(args.model, compiled=False)
+    compiled = load_model(args.model, compiled=True)
+    checkpoints = list(range(args.every, model.n_estimators_, args.every))
+    staged, final_raw = staged_scores(model, X_fit, checkpoints)
+    expected_raw, full_seconds = _timed(compiled.decision_function, X_check)
+    _, expected = _margin_and_encoded(expected_raw)
+
+    if args.command == "calibrate":
+        predictor, agreement = fit_thresholds(compiled, checkpoints, staged, final_raw, X_check, expected,
+                                              args.agreement)
+        if agreement < args.agreement:
+            print(f"Agreement on {len(X_check):,} held-out rows is {agreement:.4%}, below the target "
+                  f"{args.agreement:.4%}; {args.out} not written.", file=sys.stderr)
+            return 1
+        _, stages = predictor.staged_exit(X_check)
+        save_thresholds(args.out, predictor, args.model, target_agreement=args.agreement,
+                        held_out_agreement=agreement, held_out_rows=len(X_check), mean_stages=float(stages.mean()),
+                        reference=args.input or f"random rows, seed {args.seed}",
+                        calibrated_at=time.strftime("%Y-%m-%dT%H:%M:%S%z"))
+        print(f"Wrote {args.out}: agreement {agreement:.4%} on {len(X_check):,} held-out rows, "
+              f"{stages.mean():.1f} of {compiled.n_stages} stages per row on average", file=sys.stderr)
+        return 0
+
+    print(f"Full model: {full_seconds / len(X_check) * 1e6:.2f} us/row, {compiled.n_stages} stages",
+          file=sys.stderr)
+    print(f"{'target':>8} {'agreement':>10} {'stages/row':>11} {'us/row':>8} {'speed-up':>9}")
+    for target in [float(value) for value in args.agreements.split(",") if value]:
+        predictor, _ = fit_thresholds(compiled, checkpoints, staged, final_raw, X_check, expected, target)
+        (raw, stages), seconds = _timed(predictor.staged_exit, X_check)
+        agreement = (_margin_and_encoded(raw)[1] == expected).mean()
+        print(f"{target:>8.4f} {agreement:>10.4%} {stages.mean():>11.1f} {seconds / len(X_check) * 1e6:>8.2f} "
+              f"{full_seconds / seconds:>8.2f}x")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,193 @@
+"""Generate a self-contained NumPy predictor module from the trained model.
+
+Usage:
+    python -m generate_predictor generate [--model gradient_boosting_model.pkl] [--out generated_predictor.py]
+    python -m generate_predictor check [--module generated_predictor.py] [--rows 100000]
+
+``generate`` writes the compiled trees (see compiled_model.py) as literal
+tables into a single Python file, together with a small evaluator that only
+needs NumPy.  The module has the model's ``predict``, ``decision_function``
+and ``classes_`` for rows of the 12 ``feature_names``, so it can stand in for
+the model object, and a worker or CLI job can ``import generated_predictor``
+without joblib or scikit-learn installed and start in milliseconds.
+
+``check`` compares the module with the pickle on seeded random rows plus rows
+sitting exactly on, and just next to, every split threshold, and exits with
+status 1 if a single label or raw score differs.
+"""
+import argparse
+import importlib.util
+import os
+import sys
+import time
+
+import numpy as np
+
+from compiled_model import CompiledGradientBoosting, boundary_inputs, random_inputs
+from stress_model import feature_names, load_model, model_path
+
+default_module_path = "generated_predictor.py"
+
+EVALUATOR = '''
+# Rows evaluated together; bounds the size of the work arrays
+CHUNK_ROWS = 1024
+
+_split_feature = np.array(SPLIT_FEATURE, dtype=np.intp)
+_split_threshold = np.array(SPLIT_THRESHOLD, dtype=np.float32)
+_tree_splits = np.array(TREE_SPLITS, dtype=np.intp)
+_leaf_value = np.array(LEAF_VALUE, dtype=np.float64)
+_init_raw = np.array(INIT_RAW, dtype=np.float64)
+_classes = np.array(CLASSES)
+# Lets the module itself stand in for the model, e.g. in stress_model.predict_with_confidence
+classes_ = _classes
+_n_trees, _n_internal = _tree_splits.shape
+_depth = int(np.log2(_n_internal + 1))
+_trees = np.arange(_n_trees)
+
+
+def _raw_chunk(X):
+    # Walk every padded tree for every row at once; padding nodes (-1) always go left
+    node = np.zeros((len(X), _n_trees), dtype=np.intp)
+    rows = np.arange(len(X))[:, None]
+    for _ in range(_depth):
+        split = _tree_splits[_trees, node]
+        # Written as "not <=" so NaN goes right, as in scikit-learn
+        goes_right = (split >= 0) & ~(X[rows, _split_feature[split]] <= _split_threshold[split])
+        node = 2 * node + 1 + goes_right
+    contributions = _leaf_value[_trees, node - _n_internal].reshape(len(X), N_STAGES, N_CLASSES)
+    # Add one stage at a time, in scikit-learn's order, so the sums round the same way
+    raw = np.repeat(_init_raw[None, :], len(X), axis=0)
+    for stage in range(N_STAGES):
+        raw += contributions[:, stage]
+    return raw
+
+
+def decision_function(X):
+    """Raw class scores for rows of the FEATURE_NAMES, one row or a 2-d batch."""
+    X = np.asarray(X, dtype=np.float32)
+    if X.ndim == 1:
+        X = X.reshape(1, -1)
+    if X.shape[1] != len(FEATURE_NAMES):
+        raise ValueError(f"Expected {len(FEATURE_NAMES)} features, got {X.shape[1]}.")
+    raw = np.empty((len(X), N_CLASSES), dtype=np.float64)
+    for start in range(0, len(X), CHUNK_ROWS):
+        raw[start:start + CHUNK_ROWS] = _raw_chunk(X[start:start + CHUNK_ROWS])
+    return raw
+
+
+def predict(X):
+    """Predicted classes for rows of the FEATURE_NAMES."""
+    raw = decision_function(X)
+    if N_CLASSES == 1:
+        return _classes[(raw[:, 0] >= 0).astype(int)]
+    return _classes[np.argmax(raw, axis=1)]
+'''
+
+
+def _literal(values):
+    """Python source for a (nested) list of numbers that reads back exactly."""
+    if isinstance(values, (np.ndarray, np.generic)):
+        values = values.tolist()
+    if isinstance(values, list):
+        return "[" + ", ".join(_literal(value) for value in values) + "]"
+    return repr(values)
+
+
+def _table(name, rows, flat=False):
+    """``name = [...]`` with one row per line; with ``flat`` the rows are chunks of one flat list."""
+    lines = [f"{name} = ["]
+    if flat:
+        lines.extend("    " + " ".join(f"{_literal(value)}," for value in row) for row in rows)
+    else:
+        lines.extend(f"    {_literal(row)}," for row in rows)
+    lines.append("]")
+    return "\n".join(lines)
+
+
+def generate_source(model, source_path):
+    """Source code of the predictor module for sklearn ``model``, loaded from ``source_path``."""
+    from prediction_cache import file_sha256
+
+    compiled = CompiledGradientBoosting.from_sklearn(model)
+    # Thresholds are float32; widened to float64 their repr reads back to the same float32
+    thresholds = compiled.split_threshold.astype(np.float64)
+    header = f'''"""Stress level predictor generated from {os.path.basename(source_path)}.
+
+Generated by generate_predictor.py on {time.strftime("%Y-%m-%d")}; do not edit.
+Source sha256: {file_sha256(source_path)}
+
+Needs NumPy only.  ``predict(X)`` takes rows of the FEATURE_NAMES, in order.
+"""
+import numpy as np
+
+FEATURE_NAMES = {_literal(list(feature_names))}
+CLASSES = {_literal(compiled.classes_)}
+N_STAGES = {compiled.n_stages}
+N_CLASSES = {compiled.n_classes}
+INIT_RAW = {_literal(compiled.init_raw)}
+SPLIT_FEATURE = {_literal(compiled.split_feature)}
+'''
+    tables = [
+        _table("SPLIT_THRESHOLD", np.array_split(thresholds, max(1, len(thresholds) // 8)), flat=True),
+        "",
+        "# Split of each internal node of each tree (stage-major), as a perfect binary tree",
+        _table("TREE_SPLITS", compiled.tree_splits),
+        "",
+        "# Leaf values of each tree, times the learning rate",
+        _table("LEAF_VALUE", compiled.leaf_value),
+    ]
+    return header + "\n".join(tables) + "\n\n" + EVALUATOR
+
+
+def import_module(path):
+    """Import the generated module from ``path``."""
+    spec = importlib.util.spec_from_file_location(os.path.splitext(os.path.basename(path))[0], path)
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module
+
+
+def check_parity(model, module, X):
+    """Number of rows of ``X`` where ``module`` and ``model`` disagree on the label or raw scores."""
+    expected_raw = model.decision_function(X).reshape(len(X), -1)
+    raw = module.decision_function(X)
+    mismatched = (raw != expected_raw).any(axis=1) | (module.predict(X) != model.predict(X))
+    return int(mismatched.sum())
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Generate or check the dependency-free predictor module.")
+    parser.add_argument("--model", default=model_path, help="path to the trained model")
+    commands = parser.add_subparsers(dest="command", required=True)
+    generate = commands.add_parser("generate", help="write the predictor module")
+    generate.add_argument("--out", default=default_module_path)
+    check = commands.add_parser("check", help="compare the module's predictions with the pickle")
+    check.add_argument("--module", default=default_module_path)
+    check.add_argument("--rows", type=int, default=100_000, help="number of random rows to compare")
+    check.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args(argv)
+
+    model = load_model(args.model, compiled=False)
+    if args.command == "generate":
+        tmp_path = f"{args.out}.tmp"
+        with open(tmp_path, "w") as f:
+            f.write(generate_source(model, args.model))
+        os.replace(tmp_path, args.out)
+        print(f"Wrote {args.out} ({os.path.getsize(args.out) / 1024:.0f} KB)", file=sys.stderr)
+        return 0
+
+    module = import_module(args.module)
+    if list(module.FEATURE_NAMES) != list(feature_names):
+        print("Feature order differs from stress_model.feature_names.", file=sys.stderr)
+        return 1
+    X = np.concatenate([
+        random_inputs(args.rows, args.seed),
+        boundary_inputs(CompiledGradientBoosting.from_sklearn(model), args.seed),
+    ])
+    mismatches = check_parity(model, module, X)
+    print(f"rows: {len(X)}, mismatches: {mismatches}")
+    return 1 if mismatches else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
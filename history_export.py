@@ -0,0 +1,76 @@
+"""Export the prediction history of one user as CSV, gzip-CSV or Parquet.
+
+The history is read from the ``HistoryStore`` in batches and written batch by
+batch into a temporary file (kept in memory while small, spilled to disk when
+large), so the whole history is never held as one string.
+"""
+import csv
+import gzip
+import io
+import tempfile
+
+from history_store import history_columns, text_columns
+
+export_formats = {
+    "CSV": ("history.csv", "text/csv"),
+    "CSV (gzip)": ("history.csv.gz", "application/gzip"),
+    "Parquet": ("history.parquet", "application/vnd.apache.parquet"),
+}
+
+# Keep exports up to this size in memory before spilling to a temp file
+SPOOL_BYTES = 8 * 1024 * 1024
+
+
+def _write_csv(batches, out):
+    text = io.TextIOWrapper(out, encoding="utf-8", newline="")
+    writer = csv.writer(text)
+    writer.writerow(history_columns)
+    for batch in batches:
+        writer.writerows(batch)
+    text.flush()
+    # Leave ``out`` open for the caller
+    text.detach()
+
+
+def _write_parquet(batches, out):
+    try:
+        import pyarrow as pa
+        import pyarrow.parquet as pq
+    except ImportError:
+        raise ImportError("Parquet export requires pyarrow (pip install pyarrow).") from None
+
+    schema = pa.schema([
+        (c, pa.string() if c in text_columns else pa.float64())
+        for c in history_columns
+    ])
+    with pq.ParquetWriter(out, schema) as writer:
+        for batch in batches:
+            columns = list(zip(*batch))
+            writer.write_table(pa.Table.from_arrays(
+                [pa.array(column, type=field.type) for column, field in zip(columns, schema)],
+                schema=schema,
+            ))
+
+
+def export_history(store, user_key, fmt="CSV", batch_size=10_000):
+    """Return a binary file object, rewound, holding the exported history."""
+    if fmt not in export_formats:
+        raise ValueError(f"Unknown export format {fmt!r}, expected one of {', '.join(export_formats)}.")
+
+    out = tempfile.SpooledTemporaryFile(max_size=SPOOL_BYTES)
+    batches = store.iter_batches(user_key, batch_size)
+    if fmt == "CSV":
+        _write_csv(batches, out)
+    elif fmt == "CSV (gzip)":
+        with gzip.GzipFile(fileobj=out, mode="wb") as gz:
+            _write_csv(batches, gz)
+    else:
+        _write_parquet(batches, out)
+    out.seek(0)
+    return out
+
+
+def export_history_bytes(store, user_key, fmt="CSV"):
+    """``export_history`` as bytes, the form ``st.download_button`` serves."""
+    with export_history(store, user_key, fmt) as f:
+        return f.read()
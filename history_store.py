@@ -0,0 +1,106 @@
+"""Persistent prediction history.
+
+History used to be a list in ``st.session_state`` that was lost on reconnect
+and grew without bound.  ``HistoryStore`` keeps it in a local SQLite file
+instead, keyed per user, capped at ``max_rows_per_user`` entries (oldest are
+dropped first) and read back one page at a time.
+"""
+import os
+import sqlite3
+import time
+from contextlib import closing
+
+default_history_path = os.environ.get("STRESS_HISTORY_DB", "prediction_history.sqlite3")
+
+# Columns of a history entry, in display order
+history_columns = [
+    "Age", "BMI", "Marital Status", "Gender", "Snoring Rate", "Respiration Rate",
+    "Body Temperature", "Limb Movement", "Blood Oxygen", "Eye Movement",
+    "Sleeping Hours", "Heart Rate", "Stress Level", "Confidence", "Confidence Margin", "Model Version",
+]
+
+text_columns = {"Marital Status", "Gender", "Stress Level", "Model Version"}
+
+
+def _plain(value):
+    """NumPy scalars to plain Python values, which sqlite can store."""
+    return value.item() if hasattr(value, "item") else value
+
+
+def _quote(column):
+    return '"' + column.replace('"', '""') + '"'
+
+
+def _column_def(column):
+    return f"{_quote(column)} {'TEXT' if column in text_columns else 'REAL'}"
+
+
+class HistoryStore:
+    def __init__(self, path=default_history_path, max_rows_per_user=1000):
+        self.path = path
+        self.max_rows_per_user = max_rows_per_user
+        self._columns_sql = ", ".join(_quote(c) for c in history_columns)
+        with closing(self._connect()) as conn, conn:
+            conn.execute("PRAGMA journal_mode=WAL")
+            column_defs = ", ".join(_column_def(c) for c in history_columns)
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS history ("
+                "id INTEGER PRIMARY KEY AUTOINCREMENT, user_key TEXT NOT NULL, created_at REAL NOT NULL, "
+                f"{column_defs})"
+            )
+            conn.execute("CREATE INDEX IF NOT EXISTS history_user ON history (user_key, id)")
+            # Stores created before a column was added get it, empty for the old rows
+            existing = {row[1] for row in conn.execute("PRAGMA table_info(history)")}
+            for c in history_columns:
+                if c not in existing:
+                    conn.execute(f"ALTER TABLE history ADD COLUMN {_column_def(c)}")
+
+    def _connect(self):
+        # A connection per call keeps the store safe to share across Streamlit sessions/threads
+        return sqlite3.connect(self.path, timeout=10)
+
+    def append(self, user_key, entry):
+        values = [_plain(entry.get(c)) for c in history_columns]
+        placeholders = ", ".join("?" for _ in history_columns)
+        with closing(self._connect()) as conn, conn:
+            conn.execute(
+                f"INSERT INTO history (user_key, created_at, {self._columns_sql}) VALUES (?, ?, {placeholders})",
+                [user_key, time.time(), *values],
+            )
+            # Retention cap: drop everything older than the newest max_rows_per_user entries
+            conn.execute(
+                "DELETE FROM history WHERE user_key = ? AND id <= ("
+                "SELECT id FROM history WHERE user_key = ? ORDER BY id DESC LIMIT 1 OFFSET ?)",
+                (user_key, user_key, self.max_rows_per_user),
+            )
+
+    def count(self, user_key):
+        with closing(self._connect()) as conn:
+            return conn.execute("SELECT COUNT(*) FROM history WHERE user_key = ?", (user_key,)).fetchone()[0]
+
+    def page(self, user_key, page=0, page_size=50):
+        """Entries of one page as a list of dicts, newest first."""
+        with closing(self._connect()) as conn:
+            rows = conn.execute(
+                f"SELECT {self._columns_sql} FROM history WHERE user_key = ? ORDER BY id DESC LIMIT ? OFFSET ?",
+                (user_key, page_size, page * page_size),
+            ).fetchall()
+        return [dict(zip(history_columns, row)) for row in rows]
+
+    def iter_batches(self, user_key, batch_size=10_000):
+        """Yield all entries of ``user_key`` as lists of row tuples, oldest first."""
+        last_id = 0
+        while True:
+            with closing(self._connect()) as conn:
+                rows = conn.execute(
+                    f"SELECT id, {self._columns_sql} FROM history WHERE user_key = ? AND id > ? ORDER BY id LIMIT ?",
+                    (user_key, last_id, batch_size),
+                ).fetchall()
+            if not rows:
+                return
+            last_id = rows[-1][0]
+            yield [row[1:] for row in rows]
+
+    def clear(self, user_key):
+        with closing(self._connect()) as conn, conn:
+            conn.execute("DELETE FROM history WHERE user_key = ?", (user_key,))
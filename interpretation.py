@@ -0,0 +1,178 @@
+"""Table-driven interpretation bands for the 12 input features.
+
+Each feature's bands are declared once as sorted right-closed upper edges
+plus one label per interval: a value ``x`` gets ``labels[i]`` where
+``edges[i-1] < x <= edges[i]`` (and the last label above the last edge, or
+for NaN).  "Strictly below e" bounds use ``strictly_below(e)``, the largest float
+under ``e``.  Labelling a whole column is then a single ``np.searchsorted``.
+
+The tables reproduce the original if/elif ladders exactly, including their
+gaps (e.g. a respiration rate of 11.5 is neither "<= 11" nor "12-20" and so
+falls through to Hyperventilation).
+"""
+import numpy as np
+
+from stress_model import feature_names
+
+
+def strictly_below(edge):
+    """Right-closed edge equivalent to "x < edge"."""
+    return float(np.nextafter(edge, -np.inf))
+
+
+feature_bands = {
+    'Age': (
+        [18, 24, 45, 64],
+        ["(Adolescent)", "(Young adult)", "(Adult)", "(Middle age adult)", "(Older adult)"],
+    ),
+    'Marital Status': (
+        [strictly_below(1), 1],
+        ["Not married", "Married", "Not married"],
+    ),
+    'Gender': (
+        [strictly_below(1), 1],
+        ["Female", "Male", "Female"],
+    ),
+    'BMI': (
+        [strictly_below(18.5), 24.9, 29.9, 30],
+        ["(Underweight)", "(Normal weight)", "(Overweight)", "(Obese)", "(Extremely Obese)"],
+    ),
+    'Snoring Rate': (
+        [5, 15, 30, 45],
+        ["(Normal)", "(Mild snoring)", "(Moderate snoring)", "(Heavy Snoring)", "(Severe Snoring)"],
+    ),
+    'Respiration Rate': (
+        [11, strictly_below(12), 20],
+        ["(Hypoventilation-Slow Breath)", "(Hyperventilation-Rapid Breath)", "(Normal)",
+         "(Hyperventilation-Rapid Breath)"],
+    ),
+    'Body Temperature': (
+        [strictly_below(97.0), 99.5],
+        ["(Hypothermia-Low)", "(Normal)", "(Hyperthermia-High)"],
+    ),
+    'Limb Movement': (
+        [5, strictly_below(6), 25],
+        ["(Normal)", "(Severe)", "(Moderate)", "(Severe)"],
+    ),
+    'Blood Oxygen': (
+        [69, 79, 89, strictly_below(90), 94],
+        ["(Cyanosis-Low)", "(Severe Hypoxia)", "(Low Oxygen Level)", "(Normal Oxygen Level)",
+         "(Moderate Oxygen Level)", "(Normal Oxygen Level)"],
+    ),
+    'Eye Movement': (
+        [25],
+        ["(Normal)", "(High REM)"],
+    ),
+    'Sleeping Hours': (
+        [6, strictly_below(7), 9],
+        ["(Sleep Deprivation)", "(Hypersomnia)", "(Normal)", "(Hypersomnia)"],
+    ),
+    'Heart Rate': (
+        [39, strictly_below(40), 75],
+        ["(Bradycardia-Too Slow)", "(Tachycardia-Too Rapid)", "(Normal)", "(Tachycardia-Too Rapid)"],
+    ),
+}
+
+# Severity of every label above, shown as the label's colour in the app
+label_severity = {
+    "(Adolescent)": "neutral",
+    "(Young adult)": "neutral",
+    "(Adult)": "neutral",
+    "(Middle age adult)": "neutral",
+    "(Older adult)": "neutral",
+    "Married": "neutral",
+    "Not married": "neutral",
+    "Male": "neutral",
+    "Female": "neutral",
+    "(Underweight)": "critical",
+    "(Normal weight)": "normal",
+    "(Overweight)": "warning",
+    "(Obese)": "neutral",
+    "(Extremely Obese)": "neutral",
+    "(Normal)": "normal",
+    "(Mild snoring)": "neutral",
+    "(Moderate snoring)": "neutral",
+    "(Heavy Snoring)": "neutral",
+    "(Severe Snoring)": "neutral",
+    "(Hypoventilation-Slow Breath)": "critical",
+    "(Hyperventilation-Rapid Breath)": "warning",
+    "(Hypothermia-Low)": "critical",
+    "(Hyperthermia-High)": "neutral",
+    "(Moderate)": "neutral",
+    "(Severe)": "neutral",
+    "(Cyanosis-Low)": "neutral",
+    "(Severe Hypoxia)": "warning",
+    "(Low Oxygen Level)": "warning",
+    "(Moderate Oxygen Level)": "neutral",
+    "(Normal Oxygen Level)": "normal",
+    "(High REM)": "neutral",
+    "(Sleep Deprivation)": "critical",
+    "(Hypersomnia)": "warning",
+    "(Bradycardia-Too Slow)": "critical",
+    "(Tachycardia-Too Rapid)": "neutral",
+}
+
+severity_colors = {
+    "critical": "#d32f2f",  # Red
+    "warning": "#f57c00",  # Orange
+    "normal": "#388e3c",  # Green
+    "neutral": "#616161",  # Grey for unknown or neutral
+}
+
+# Distinct labels of each feature, in first-seen order; band codes index into these
+feature_categories = {}
+_band_codes = {}
+for _name, (_edges, _labels) in feature_bands.items():
+    if list(_edges) != sorted(_edges) or len(_labels) != len(_edges) + 1:
+        raise ValueError(f"Bad interpretation bands for {_name}")
+    feature_categories[_name] = list(dict.fromkeys(_labels))
+    _band_codes[_name] = (
+        np.asarray(_edges, dtype=float),
+        np.array([feature_categories[_name].index(label) for label in _labels], dtype=np.int8),
+    )
+if set(feature_bands) != set(feature_names):
+    raise ValueError("Interpretation bands must cover exactly the model features")
+
+_unrated = sorted({label for labels in feature_categories.values() for label in labels} - set(label_severity))
+if _unrated or not set(label_severity.values()) <= set(severity_colors):
+    raise ValueError(f"Every interpretation label needs a known severity, missing: {_unrated}")
+
+# Colour of each band code, per feature, so whole label columns map to colours by indexing
+feature_colors = {
+    name: np.array([severity_colors[label_severity[label]] for label in categories], dtype=object)
+    for name, categories in feature_categories.items()
+}
+
+
+def band_codes(name, values):
+    """Category codes (indexes into ``feature_categories[name]``) for a column of values."""
+    edges, codes = _band_codes[name]
+    return codes[np.searchsorted(edges, np.asarray(values, dtype=float), side='left')]
+
+
+def describe(name, value):
+    """Interpretation label of a single value."""
+    return feature_categories[name][int(band_codes(name, value))]
+
+
+def status_color(label):
+    """Display colour of a single interpretation label."""
+    return severity_colors[label_severity[label]]
+
+
+def band_colors(name, values):
+    """Display colours for a column of values, without building the labels."""
+    return feature_colors[name][band_codes(name, values)]
+
+
+def interpret_frame(df):
+    """``<feature> Interpretation`` categorical columns for every feature in ``df``."""
+    import pandas as pd
+
+    columns = {}
+    for name in feature_names:
+        if name in df.columns:
+            columns[f"{name} Interpretation"] = pd.Categorical.from_codes(
+                band_codes(name, df[name].to_numpy(dtype=float)), categories=feature_categories[name]
+            )
+    return pd.DataFrame(columns, index=df.index)
@@ -0,0 +1,128 @@
+"""Timing hooks and counters for the prediction paths.
+
+``metrics`` is one process-wide ``Metrics`` registry.  Code under measurement
+wraps a stage in ``with metrics.time("model_predict"):`` or bumps a counter
+with ``metrics.increment("predictions", n)``.  Every stage keeps its most
+recent ``window`` durations, from which the p50/p95/p99 latencies are taken,
+plus a running count and total.
+
+``prometheus_text()`` renders everything in the Prometheus text exposition
+format (stages as summaries, counters as counters); the app can write it to
+``STRESS_METRICS_FILE`` and the HTTP service serves it on ``GET /metrics``.
+"""
+import os
+import tempfile
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+
+import numpy as np
+
+QUANTILES = (0.5, 0.95, 0.99)
+
+
+class Metrics:
+    def __init__(self, window=1000, prefix="stress"):
+        self.window = window
+        self.prefix = prefix
+        self._lock = threading.Lock()
+        self._durations = {}
+        self._totals = {}
+        self._counters = {}
+        self._last_export = 0.0
+
+    def record(self, stage, seconds):
+        with self._lock:
+            if stage not in self._durations:
+                self._durations[stage] = deque(maxlen=self.window)
+                self._totals[stage] = [0, 0.0]
+            self._durations[stage].append(seconds)
+            self._totals[stage][0] += 1
+            self._totals[stage][1] += seconds
+
+    @contextmanager
+    def time(self, stage):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.record(stage, time.perf_counter() - start)
+
+    def increment(self, name, amount=1):
+        with self._lock:
+            self._counters[name] = self._counters.get(name, 0) + amount
+
+    def reset(self):
+        with self._lock:
+            self._durations.clear()
+            self._totals.clear()
+            self._counters.clear()
+
+    def summary(self):
+        """``{"timings": {stage: {...}}, "counters": {...}}`` with latencies in milliseconds."""
+        with self._lock:
+            durations = {stage: np.array(values) for stage, values in self._durations.items()}
+            totals = {stage: tuple(total) for stage, total in self._totals.items()}
+            counters = dict(self._counters)
+
+        timings = {}
+        for stage, values in sorted(durations.items()):
+            count, total = totals[stage]
+            p50, p95, p99 = np.percentile(values, [q * 100 for q in QUANTILES]) * 1000
+            timings[stage] = {
+                "count": count,
+                "mean_ms": total / count * 1000,
+                "p50_ms": float(p50),
+                "p95_ms": float(p95),
+                "p99_ms": float(p99),
+            }
+        return {"timings": timings, "counters": dict(sorted(counters.items()))}
+
+    def prometheus_text(self):
+        with self._lock:
+            durations = {stage: np.array(values) for stage, values in self._durations.items()}
+            totals = {stage: tuple(total) for stage, total in self._totals.items()}
+            counters = dict(self._counters)
+
+        name = f"{self.prefix}_stage_seconds"
+        lines = [
+            f"# HELP {name} Duration of instrumented stages (rolling window quantiles).",
+            f"# TYPE {name} summary",
+        ]
+        for stage, values in sorted(durations.items()):
+            for q, value in zip(QUANTILES, np.percentile(values, [q * 100 for q in QUANTILES])):
+                lines.append(f'{name}{{stage="{stage}",quantile="{q}"}} {value:.9g}')
+            count, total = totals[stage]
+            lines.append(f'{name}_sum{{stage="{stage}"}} {total:.9g}')
+            lines.append(f'{name}_count{{stage="{stage}"}} {count}')
+        for counter, value in sorted(counters.items()):
+            counter_name = f"{self.prefix}_{counter}_total"
+            lines.append(f"# TYPE {counter_name} counter")
+            lines.append(f"{counter_name} {value}")
+        return "\n".join(lines) + "\n"
+
+    def write_prometheus(self, path, min_interval=0.0):
+        """Write ``prometheus_text()`` to ``path`` (atomically, for node_exporter's
+        textfile collector), at most once every ``min_interval`` seconds.
+
+        Returns whether the file was written.
+        """
+        now = time.monotonic()
+        with self._lock:
+            if self._last_export and now - self._last_export < min_interval:
+                return False
+            self._last_export = now
+        text = self.prometheus_text()
+        # A temporary file of its own, so concurrent writers never replace each other's half-written file
+        directory, name = os.path.split(os.path.abspath(path))
+        with tempfile.NamedTemporaryFile("w", dir=directory, prefix=f".{name}.", suffix=".tmp", delete=False) as f:
+            f.write(text)
+        tmp_path = f.name
+        # Created owner-only; the collector may run as another user
+        os.chmod(tmp_path, 0o644)
+        os.replace(tmp_path, path)
+        return True
+
+
+metrics = Metrics()
@@ -0,0 +1,122 @@
+"""Coalesce concurrent prediction requests into one ``model.predict`` call.
+
+Each call to ``model.predict`` has a fixed overhead (input validation, tree
+setup) that dominates for a single 1x12 row.  ``MicroBatcher`` queues the rows
+of concurrent requests for at most ``max_wait_ms`` milliseconds or until
+``max_rows`` rows are waiting, predicts them as one matrix in a worker thread
+and hands every caller back its own slice of the result.
+
+    batcher = MicroBatcher(model.predict, max_wait_ms=2, max_rows=256)
+    predictions = await batcher.predict([[30, 1, 1, 24.0, ...]])
+"""
+import asyncio
+import time
+from collections import deque
+
+import numpy as np
+
+from stress_model import feature_names
+
+
+class BatchStats:
+    """Rolling record of the most recent batches."""
+
+    def __init__(self, window=1000):
+        self.batches = deque(maxlen=window)
+        self.total_batches = 0
+        self.total_rows = 0
+        self.total_requests = 0
+
+    def record(self, rows, requests, seconds):
+        self.batches.append((rows, requests, seconds))
+        self.total_batches += 1
+        self.total_rows += rows
+        self.total_requests += requests
+
+    def summary(self):
+        if not self.batches:
+            return {"batches": 0}
+        rows = np.array([b[0] for b in self.batches])
+        requests = np.array([b[1] for b in self.batches])
+        latency_ms = np.array([b[2] for b in self.batches]) * 1000
+        return {
+            "batches": self.total_batches,
+            "rows": self.total_rows,
+            "requests": self.total_requests,
+            "mean_batch_rows": float(rows.mean()),
+            "mean_batch_requests": float(requests.mean()),
+            "max_batch_rows": int(rows.max()),
+            "latency_ms_p50": float(np.percentile(latency_ms, 50)),
+            "latency_ms_p95": float(np.percentile(latency_ms, 95)),
+        }
+
+
+class MicroBatcher:
+    def __init__(self, predict, max_wait_ms=2.0, max_rows=256, on_batch=None, returns_info=False):
+        """``predict`` takes a 2D array and returns one prediction per row.
+
+        With ``returns_info`` it returns ``(predictions, info)`` instead, e.g.
+        the model version, and every caller gets ``(its predictions, info)``.
+        ``on_batch`` is called after every batch with ``(rows, requests, seconds)``.
+        """
+        self._predict = predict
+        self.returns_info = returns_info
+        self.max_wait = max_wait_ms / 1000
+        self.max_rows = max_rows
+        self.on_batch = on_batch
+        self.stats = BatchStats()
+        self._pending = []
+        self._pending_rows = 0
+        self._timer = None
+        self._tasks = set()
+
+    async def predict(self, rows):
+        """Queue ``rows`` and wait for their predictions."""
+        rows = np.asarray(rows, dtype=float).reshape(-1, len(feature_names))
+        loop = asyncio.get_running_loop()
+        future = loop.create_future()
+        self._pending.append((rows, future))
+        self._pending_rows += len(rows)
+
+        if self._pending_rows >= self.max_rows:
+            self._flush()
+        elif self._timer is None:
+            self._timer = loop.call_later(self.max_wait, self._flush)
+        return await future
+
+    def _flush(self):
+        if self._timer is not None:
+            self._timer.cancel()
+            self._timer = None
+        if not self._pending:
+            return
+        batch, self._pending, self._pending_rows = self._pending, [], 0
+        # Keep a reference so the task is not garbage collected while it runs
+        task = asyncio.ensure_future(self._run(batch))
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+
+    async def _run(self, batch):
+        loop = asyncio.get_running_loop()
+        X = np.concatenate([rows for rows, _ in batch]) if len(batch) > 1 else batch[0][0]
+        start = time.perf_counter()
+        try:
+            result = await loop.run_in_executor(None, self._predict, X)
+        except Exception as e:
+            for _, future in batch:
+                if not future.done():
+                    future.set_exception(e)
+            return
+        seconds = time.perf_counter() - start
+        predictions, info = result if self.returns_info else (result, None)
+
+        offset = 0
+        for rows, future in batch:
+            if not future.done():
+                part = predictions[offset:offset + len(rows)]
+                future.set_result((part, info) if self.returns_info else part)
+            offset += len(rows)
+
+        self.stats.record(len(X), len(batch), seconds)
+        if self.on_batch is not None:
+            self.on_batch(len(X), len(batch), seconds)
@@ -0,0 +1,152 @@
+"""Compact, memory-mappable export of the trained model.
+
+    python -m model_artifact export [--model gradient_boosting_model.pkl] [--out DIR]
+    python -m model_artifact info [--out DIR]
+
+``export`` writes the compiled tree arrays (see compiled_model.py) and the
+lookup tables derived from them as one ``.npy`` file each, plus a
+``metadata.json`` holding the feature order, the scikit-learn version used
+for the export and the size, mtime and SHA-256 of the source pickle.
+
+``load_artifact`` memory-maps the arrays read-only, so loading takes a few
+milliseconds and every worker process on the host shares one copy of the
+pages, lookup tables included.  ``load_fast`` uses the artifact when it is
+present and was exported from the current pickle, and otherwise falls back
+to unpickling.
+"""
+import argparse
+import json
+import os
+import sys
+import time
+
+import numpy as np
+
+from compiled_model import CompiledGradientBoosting
+from stress_model import feature_names, model_path
+
+FORMAT_VERSION = 2
+
+default_artifact_path = os.path.splitext(model_path)[0] + ".arrays"
+
+
+def _file_signature(path):
+    stat = os.stat(path)
+    return {"size": stat.st_size, "mtime_ns": stat.st_mtime_ns}
+
+
+def export_artifact(model, source_path, out_dir=default_artifact_path, **info):
+    """Write the compiled arrays of ``model`` and their metadata to ``out_dir``.
+
+    Extra keyword arguments are stored in the metadata as they are.
+    """
+    import sklearn
+    from prediction_cache import file_sha256
+
+    compiled = model if isinstance(model, CompiledGradientBoosting) else CompiledGradientBoosting.from_sklearn(model)
+    os.makedirs(out_dir, exist_ok=True)
+    arrays = compiled.arrays()
+    for name, array in arrays.items():
+        np.save(os.path.join(out_dir, name + ".npy"), np.ascontiguousarray(array), allow_pickle=False)
+
+    metadata = {
+        "format_version": FORMAT_VERSION,
+        "feature_names": feature_names,
+        "n_stages": compiled.n_stages,
+        "sklearn_version": sklearn.__version__,
+        "exported_at": time.strftime("%Y-%m-%dT%H:%M:%S%z"),
+        "source": {
+            "path": os.path.basename(source_path),
+            "sha256": file_sha256(source_path),
+            **_file_signature(source_path),
+        },
+        "arrays": sorted(arrays),
+        **info,
+    }
+    # Metadata goes last, so a half-written export is never considered valid
+    tmp_path = os.path.join(out_dir, "metadata.json.tmp")
+    with open(tmp_path, "w") as f:
+        json.dump(metadata, f, indent=2)
+    os.replace(tmp_path, os.path.join(out_dir, "metadata.json"))
+    return metadata
+
+
+def read_metadata(artifact_path=default_artifact_path):
+    with open(os.path.join(artifact_path, "metadata.json")) as f:
+        return json.load(f)
+
+
+def is_fresh(artifact_path=default_artifact_path, source_path=model_path):
+    """True when the artifact exists and was exported from the current ``source_path``.
+
+    Compressed variants (see compress_model.py) record the pickle they were
+    derived from as their source too, but predict differently from it, so
+    they are never fresh.
+    """
+    try:
+        metadata = read_metadata(artifact_path)
+    except (OSError, ValueError):
+        return False
+    if metadata.get("format_version") != FORMAT_VERSION or metadata.get("feature_names") != feature_names:
+        return False
+    if "compression" in metadata:
+        return False
+
+    source = metadata.get("source", {})
+    signature = _file_signature(source_path)
+    if signature["size"] != source.get("size"):
+        return False
+    if signature["mtime_ns"] == source.get("mtime_ns"):
+        return True
+    # Same size but touched since the export: compare contents
+    from prediction_cache import file_sha256
+    return file_sha256(source_path) == source.get("sha256")
+
+
+def load_artifact(artifact_path=default_artifact_path, mmap=True):
+    """Load an exported artifact, memory-mapping the arrays by default."""
+    metadata = read_metadata(artifact_path)
+    mode = "r" if mmap else None
+    arrays = {
+        name: np.load(os.path.join(artifact_path, name + ".npy"), mmap_mode=mode, allow_pickle=False)
+        for name in metadata["arrays"]
+    }
+    return CompiledGradientBoosting(n_stages=metadata["n_stages"], **arrays)
+
+
+def load_fast(source_path=model_path, artifact_path=None):
+    """Load the artifact if it is fresh, else unpickle ``source_path`` and compile it."""
+    if artifact_path is None:
+        artifact_path = os.path.splitext(source_path)[0] + ".arrays"
+    if is_fresh(artifact_path, source_path):
+        return load_artifact(artifact_path)
+
+    from stress_model import load_model
+    return CompiledGradientBoosting.from_sklearn(load_model(source_path, compiled=False))
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Export or inspect the memory-mappable model artifact.")
+    parser.add_argument("command", choices=["export", "info"])
+    parser.add_argument("--model", default=model_path, help="path to the trained model pickle")
+    parser.add_argument("--out", default=None, help="artifact directory (default: next to the pickle)")
+    args = parser.parse_args(argv)
+    out_dir = args.out or os.path.splitext(args.model)[0] + ".arrays"
+
+    if args.command == "export":
+        from stress_model import load_model
+        metadata = export_artifact(load_model(args.model, compiled=False), args.model, out_dir)
+        size = sum(os.path.getsize(os.path.join(out_dir, name + ".npy")) for name in metadata["arrays"])
+        print(f"Wrote {out_dir} ({size / 1024:.0f} KB)")
+    else:
+        print(json.dumps(read_metadata(out_dir), indent=2))
+        print("fresh" if is_fresh(out_dir, args.model) else "stale")
+
+        start = time.perf_counter()
+        load_artifact(out_dir)
+        print(f"load time: {(time.perf_counter() - start) * 1000:.1f} ms")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
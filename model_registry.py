@@ -0,0 +1,254 @@
+"""Local registry of versioned models, and hot reloading of the active one.
+
+Layout of the registry directory (``STRESS_MODEL_REGISTRY``, default
+``models``)::
+
+    models/
+        CURRENT                 name of the active version
+        v0001/model.pkl
+        v0001/metadata.json     version, feature order, training date, checksum, ...
+        v0002/...
+
+Usage:
+    python -m model_registry add gradient_boosting_model.pkl [--version v0002] [--trained-at 2024-05-01] [--activate]
+    python -m model_registry activate v0002
+    python -m model_registry list
+
+Versions are never modified once added; switching models only rewrites
+``CURRENT`` (atomically).  ``RegistryWatcher`` polls ``CURRENT`` from a
+background thread, loads and checks the new version off the request path and
+then swaps it into the running predictor in one step, so a retrain needs no
+restart.  When the registry has no active version the app and tools keep
+using ``stress_model.model_path``.
+"""
+import argparse
+import json
+import logging
+import os
+import re
+import shutil
+import sys
+import threading
+import time
+
+from prediction_cache import checksum_version, file_sha256
+from stress_model import feature_names, load_model, model_path
+
+default_registry_path = os.environ.get("STRESS_MODEL_REGISTRY", "models")
+
+MODEL_FILE = "model.pkl"
+METADATA_FILE = "metadata.json"
+CURRENT_FILE = "CURRENT"
+
+logger = logging.getLogger("stress_model_registry")
+
+
+def _write_atomic(path, text):
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, "w") as f:
+        f.write(text)
+    os.replace(tmp_path, path)
+
+
+def _column_key(name):
+    # The model was trained on snake_case column names ("blood_oxygen" for "Blood Oxygen")
+    return name.strip().lower().replace(" ", "_")
+
+
+def file_version(path):
+    """Version label of a model file outside the registry: its checksum prefix."""
+    return checksum_version(file_sha256(path))
+
+
+class ModelRegistry:
+    def __init__(self, root=default_registry_path):
+        self.root = root
+
+    def versions(self):
+        """Registered versions, in name order."""
+        if not os.path.isdir(self.root):
+            return []
+        return sorted(
+            name for name in os.listdir(self.root)
+            if os.path.isfile(os.path.join(self.root, name, METADATA_FILE))
+        )
+
+    def model_path(self, version):
+        return os.path.join(self.root, version, MODEL_FILE)
+
+    def metadata(self, version):
+        with open(os.path.join(self.root, version, METADATA_FILE)) as f:
+            return json.load(f)
+
+    def current_version(self):
+        """The active version, or None when the registry has none."""
+        try:
+            with open(os.path.join(self.root, CURRENT_FILE)) as f:
+                version = f.read().strip()
+        except FileNotFoundError:
+            return None
+        return version or None
+
+    def _next_version(self):
+        numbers = [int(v[1:]) for v in self.versions() if re.fullmatch(r"v\d+", v)]
+        return f"v{max(numbers, default=0) + 1:04d}"
+
+    def add(self, source_path, version=None, trained_at=None, activate=False):
+        """Copy ``source_path`` into the registry as a new version and return its metadata.
+
+        The model is loaded once to check that it takes the ``feature_names``
+        in the app's order.
+        """
+        version = version or self._next_version()
+        if not re.fullmatch(r"[A-Za-z0-9._-]+", version):
+            raise ValueError(f"Invalid version name {version!r}.")
+        version_dir = os.path.join(self.root, version)
+        if os.path.exists(version_dir):
+            raise ValueError(f"Version {version} already exists.")
+
+        model = load_model(source_path, compiled=False)
+        model_features = [str(name) for name in getattr(model, "feature_names_in_", feature_names)]
+        if [_column_key(name) for name in model_features] != [_column_key(name) for name in feature_names]:
+            raise ValueError(f"Model features {model_features} do not match the app's feature order.")
+
+        if trained_at is None:
+            trained_at = time.strftime("%Y-%m-%dT%H:%M:%S", time.localtime(os.path.getmtime(source_path)))
+        import sklearn
+
+        # Written under a temporary name so watchers never see a half-copied version
+        tmp_dir = os.path.join(self.root, f".{version}.tmp")
+        shutil.rmtree(tmp_dir, ignore_errors=True)
+        os.makedirs(tmp_dir)
+        shutil.copy2(source_path, os.path.join(tmp_dir, MODEL_FILE))
+        metadata = {
+            "version": version,
+            "feature_names": feature_names,
+            "model_feature_names": model_features,
+            "classes": [int(c) for c in model.classes_],
+            "trained_at": trained_at,
+            "added_at": time.strftime("%Y-%m-%dT%H:%M:%S%z"),
+            "sha256": file_sha256(source_path),
+            "size": os.path.getsize(source_path),
+            "source": os.path.abspath(source_path),
+            "sklearn_version": sklearn.__version__,
+        }
+        with open(os.path.join(tmp_dir, METADATA_FILE), "w") as f:
+            json.dump(metadata, f, indent=2)
+        os.rename(tmp_dir, version_dir)
+
+        if activate:
+            self.activate(version)
+        return metadata
+
+    def verify(self, version):
+        """Raise ValueError if the stored model of ``version`` does not match its metadata."""
+        metadata = self.metadata(version)
+        if metadata.get("feature_names") != feature_names:
+            raise ValueError(f"Version {version} was registered with a different feature order.")
+        if file_sha256(self.model_path(version)) != metadata.get("sha256"):
+            raise ValueError(f"Checksum mismatch for version {version}.")
+
+    def activate(self, version):
+        self.verify(version)
+        os.makedirs(self.root, exist_ok=True)
+        _write_atomic(os.path.join(self.root, CURRENT_FILE), version + "\n")
+
+    def load(self, version, loader=load_model):
+        """Verify ``version`` and load it with ``loader(path)``."""
+        self.verify(version)
+        return loader(self.model_path(version))
+
+
+def active_model(registry=None):
+    """``(path, version)`` of the model to serve: the registry's active version
+    (checked against its metadata) if there is one, else ``stress_model.model_path``."""
+    registry = registry or ModelRegistry()
+    version = registry.current_version()
+    if version is not None:
+        registry.verify(version)
+        return registry.model_path(version), version
+    return model_path, file_version(model_path) if os.path.exists(model_path) else None
+
+
+def resolve_model(path=None):
+    """``(path, version)`` for a model given on the command line, or ``active_model()`` when None."""
+    if path is None:
+        return active_model()
+    return path, file_version(path)
+
+
+class RegistryWatcher:
+    """Background thread swapping newly activated versions into ``target``.
+
+    ``target`` needs a ``model_version`` attribute and a
+    ``swap(path, model, version)`` method, like ``CachedPredictor``.
+    """
+
+    def __init__(self, registry, target, loader=load_model, interval=5.0):
+        self.registry = registry
+        self.target = target
+        self.loader = loader
+        self.interval = interval
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, name="model-registry-watcher", daemon=True)
+
+    def start(self):
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._stop.set()
+        self._thread.join()
+
+    def check(self):
+        """Swap in the active version if it changed; returns whether it did."""
+        version = self.registry.current_version()
+        if version is None or version == self.target.model_version:
+            return False
+        # Loaded and verified here, outside the request path; the old model keeps serving meanwhile
+        model = self.registry.load(version, self.loader)
+        self.target.swap(self.registry.model_path(version), model, version)
+        logger.info("Switched to model version %s", version)
+        return True
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            try:
+                self.check()
+            except Exception:
+                logger.exception("Could not load the active model version")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Manage the local model registry.")
+    parser.add_argument("--registry", default=default_registry_path, help="registry directory")
+    commands = parser.add_subparsers(dest="command", required=True)
+    add = commands.add_parser("add", help="register a trained model")
+    add.add_argument("model", nargs="?", default=model_path, help="model pickle to register")
+    add.add_argument("--version", help="version name (default: next vNNNN)")
+    add.add_argument("--trained-at", help="training date (default: the file's modification time)")
+    add.add_argument("--activate", action="store_true", help="make it the active version")
+    activate = commands.add_parser("activate", help="switch the active version")
+    activate.add_argument("version")
+    commands.add_parser("list", help="list the registered versions")
+    args = parser.parse_args(argv)
+
+    registry = ModelRegistry(args.registry)
+    if args.command == "add":
+        metadata = registry.add(args.model, args.version, args.trained_at, args.activate)
+        print(f"Added {metadata['version']} (sha256 {metadata['sha256'][:12]})"
+              + (", active" if args.activate else ""))
+    elif args.command == "activate":
+        registry.activate(args.version)
+        print(f"Active version: {args.version}")
+    else:
+        current = registry.current_version()
+        for version in registry.versions():
+            metadata = registry.metadata(version)
+            marker = "*" if version == current else " "
+            print(f"{marker} {version}  trained {metadata['trained_at']}  sha256 {metadata['sha256'][:12]}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
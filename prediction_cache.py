@@ -0,0 +1,218 @@
+"""LRU cache of predictions keyed on the rounded 12-feature input.
+
+Clinicians often re-run the same or nearly the same inputs, and every
+Streamlit rerun would call ``model.predict`` again.  ``CachedPredictor`` keeps
+the most recent predictions keyed on the input in units of the sidebar step
+sizes (1 for Age and the Yes/No options, 0.1 for everything else) and only
+sends the rows it has not seen to the model.  Rows between the steps always
+go to the model.  Each entry holds the label and
+the class probabilities, so the confidence comes from the cache as well.
+
+The model file is watched: when its mtime or size changes and its SHA-256
+differs from the one that was loaded, the model is reloaded and the cache is
+replaced.  Every prediction reports the version of the model that made it.
+One instance is meant to be shared by every session of a server process (the
+app creates it with ``st.cache_resource``), so it is thread safe.
+"""
+import hashlib
+import os
+import threading
+from collections import OrderedDict
+
+import numpy as np
+
+from incremental import IncrementalScorer, compiled_for
+from metrics import metrics
+from stress_model import confidence_margin, feature_names, load_model, predict_with_confidence
+
+# Widget step size of each feature, used to quantize cache keys
+feature_steps = {name: 0.1 for name in feature_names}
+feature_steps.update({'Age': 1, 'Marital Status': 1, 'Gender': 1})
+
+
+def file_sha256(path):
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(1 << 20), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def checksum_version(sha256):
+    """Version label of a model known only by its checksum."""
+    return "sha256:" + sha256[:12]
+
+
+class PredictionCache:
+    """Thread-safe LRU mapping of quantized input rows to ``(label, probabilities)``."""
+
+    def __init__(self, max_size=4096):
+        self.max_size = max_size
+        self.hits = 0
+        self.misses = 0
+        self._steps = np.array([feature_steps[name] for name in feature_names], dtype=float)
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def keys_for(self, X):
+        """One hashable key per row of ``X``, or None for a row off the widget steps.
+
+        Rows between the steps (e.g. a typed Limb Movement of 23.04) are not
+        cached: their key would be shared with the grid point, whose prediction
+        can differ.  The model sees float32, so a row is on the grid when it
+        equals its grid point in float32.
+        """
+        X = np.asarray(X, dtype=float)
+        quantized = np.round(X / self._steps)
+        on_grid = (X.astype(np.float32) == (quantized * self._steps).astype(np.float32)).all(axis=1)
+        return [row.tobytes() if exact else None
+                for row, exact in zip(np.nan_to_num(quantized).astype(np.int64), on_grid)]
+
+    def get(self, key):
+        with self._lock:
+            if key in self._entries:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return self._entries[key]
+            self.misses += 1
+            return None
+
+    def put(self, key, value):
+        with self._lock:
+            self._entries[key] = value
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self):
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "size": len(self._entries),
+                "max_size": self.max_size,
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": self.hits / lookups if lookups else 0.0,
+            }
+
+    def __len__(self):
+        return len(self._entries)
+
+
+class CachedPredictor:
+    """``predict`` through a ``PredictionCache``, reloading the model when its file changes.
+
+    ``version`` labels the loaded model (default: its checksum, see
+    ``checksum_version``).  ``swap`` replaces the model, its version and the
+    cache in one step; ``model_registry.RegistryWatcher`` uses it.
+    ``incremental_scorer`` gives a session its own scorer for cache misses.
+    """
+
+    def __init__(self, model_path, max_size=4096, loader=load_model, version=None):
+        self.max_size = max_size
+        self._loader = loader
+        self._lock = threading.Lock()
+        self._current = None
+        # (version, CompiledGradientBoosting) shared by the incremental scorers
+        self._compiled = None
+        stat = os.stat(model_path)
+        with metrics.time("load_model"):
+            model = loader(model_path)
+        self._install(model_path, model, version, stat)
+
+    @property
+    def model(self):
+        return self._current[0]
+
+    @property
+    def model_version(self):
+        return self._current[1]
+
+    @property
+    def cache(self):
+        return self._current[2]
+
+    def _install(self, path, model, version, stat):
+        previous = self._current
+        self.model_path = path
+        self.model_sha256 = file_sha256(path)
+        self._file_signature = (stat.st_mtime_ns, stat.st_size)
+        # A single assignment, so a prediction never pairs one model with another's cache or version
+        self._current = (model, version or checksum_version(self.model_sha256), PredictionCache(self.max_size))
+        if previous is not None and hasattr(previous[0], "close"):
+            # A replaced worker pool shuts its processes down once its in-flight calls return
+            previous[0].close()
+
+    def swap(self, path, model, version):
+        """Serve ``model`` (loaded from ``path``) as ``version`` from now on."""
+        with self._lock:
+            self._install(path, model, version, os.stat(path))
+
+    def check_model_file(self):
+        """Reload the model and clear the cache if the model file changed."""
+        stat = os.stat(self.model_path)
+        if (stat.st_mtime_ns, stat.st_size) == self._file_signature:
+            return False
+        with self._lock:
+            stat = os.stat(self.model_path)
+            if (stat.st_mtime_ns, stat.st_size) == self._file_signature:
+                return False
+            if file_sha256(self.model_path) == self.model_sha256:
+                # Touched but identical, e.g. copied over itself
+                self._file_signature = (stat.st_mtime_ns, stat.st_size)
+                return False
+            with metrics.time("load_model"):
+                model = self._loader(self.model_path)
+            self._install(self.model_path, model, None, stat)
+            return True
+
+    def incremental_scorer(self):
+        """A new ``incremental.IncrementalScorer`` for the current model, to keep per session."""
+        model, version, _ = self._current
+        with self._lock:
+            if self._compiled is None or self._compiled[0] != version:
+                self._compiled = (version, compiled_for(model))
+            compiled = self._compiled[1]
+        return IncrementalScorer(compiled, version)
+
+    def predict_with_confidence(self, X, scorer=None):
+        """``(labels, probabilities, margins, version)`` for the rows of ``X``.
+
+        Rows missing from the cache go through the ensemble once, see
+        ``stress_model.predict_with_confidence``, or through ``scorer`` when it
+        is an ``IncrementalScorer`` for the current model version.
+        """
+        self.check_model_file()
+        model, version, cache = self._current
+        if scorer is not None and scorer.model_version == version:
+            model = scorer
+        X = np.asarray(X, dtype=float).reshape(-1, len(feature_names))
+        keys = cache.keys_for(X)
+
+        entries = [cache.get(key) if key is not None else None for key in keys]
+        missing = [i for i, entry in enumerate(entries) if entry is None]
+        metrics.increment("predictions", len(X))
+        metrics.increment("cache_hits", len(X) - len(missing))
+        metrics.increment("cache_misses", len(missing))
+        if missing:
+            with metrics.time("model_predict"):
+                labels, probabilities, _ = predict_with_confidence(model, X[missing])
+            for i, label, row in zip(missing, labels, probabilities):
+                entries[i] = (label, row)
+                if keys[i] is not None:
+                    cache.put(keys[i], entries[i])
+        labels = np.array([label for label, _ in entries])
+        probabilities = np.array([row for _, row in entries]).reshape(len(X), -1)
+        return labels, probabilities, confidence_margin(probabilities), version
+
+    def predict_versioned(self, X):
+        """``predict`` plus the version of the model that made the predictions."""
+        labels, _, _, version = self.predict_with_confidence(X)
+        return labels, version
+
+    def predict(self, X):
+        return self.predict_versioned(X)[0]
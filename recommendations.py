@@ -0,0 +1,107 @@
+"""Data-driven recommendation rules.
+
+Every rule group (one per feature) maps a value to a rule ID using the same
+right-closed band edges as interpretation.py: a value ``x`` gets
+``rule_ids[i]`` where ``edges[i-1] < x <= edges[i]``.  ``nan_rule`` is the
+rule a missing value falls through to in the original if/elif ladders.
+
+``recommend_frame`` evaluates every rule on a whole DataFrame at once and
+returns categorical columns of rule IDs, so each distinct recommendation is
+stored once however many rows there are.  The markdown shown in the app is
+looked up from the IDs in ``recommendation_text``.
+"""
+import numpy as np
+
+from interpretation import strictly_below
+
+# (group, feature, edges, rule_ids, nan_rule), in the order the app lists them
+recommendation_rules = [
+    ("BMI", 'BMI', [strictly_below(18.5), 24.9, 29.9],
+     ["bmi_underweight", "bmi_normal", "bmi_overweight", "bmi_obese"], "bmi_obese"),
+    ("Blood Oxygen", 'Blood Oxygen', [strictly_below(90), 94],
+     ["oxygen_low", "oxygen_slightly_low", "oxygen_normal"], "oxygen_normal"),
+    ("Heart Rate", 'Heart Rate', [strictly_below(40), 75],
+     ["heart_bradycardia", "heart_normal", "heart_tachycardia"], "heart_tachycardia"),
+    ("Snoring", 'Snoring Rate', [15, 30],
+     ["snoring_normal", "snoring_mild", "snoring_heavy"], "snoring_normal"),
+    ("Respiration", 'Respiration Rate', [strictly_below(12), 20],
+     ["respiration_slow", "respiration_normal", "respiration_rapid"], "respiration_normal"),
+    ("Body Temperature", 'Body Temperature', [strictly_below(97.0), 99.5],
+     ["temperature_low", "temperature_normal", "temperature_high"], "temperature_normal"),
+    ("Limb Movement", 'Limb Movement', [5, 25],
+     ["limb_normal", "limb_moderate", "limb_severe"], "limb_normal"),
+    ("Eye Movement", 'Eye Movement', [25],
+     ["eye_normal", "eye_high_rem"], "eye_normal"),
+    ("Sleeping Hours", 'Sleeping Hours', [strictly_below(6), 9],
+     ["sleep_deprivation", "sleep_normal", "sleep_excessive"], "sleep_normal"),
+]
+
+recommendation_text = {
+    "bmi_underweight": "📉 **Underweight**: Consider consulting a healthcare provider for a nutritional plan to reach a healthier weight.",
+    "bmi_normal": "✅ **Normal Weight**: Great job maintaining a healthy BMI!",
+    "bmi_overweight": "⚖️ **Overweight**: Engaging in a balanced diet and regular physical activity can help manage your BMI.",
+    "bmi_obese": "📈 **Obese**: It's advisable to seek guidance from a healthcare professional for a comprehensive weight management plan.",
+    "oxygen_low": "🩸 **Low Blood Oxygen**: Low blood oxygen levels detected. Please consult a healthcare professional immediately.",
+    "oxygen_slightly_low": "🟠 **Low Oxygen Level**: Consider deep breathing exercises and ensure you're in a well-ventilated environment.",
+    "oxygen_normal": "🟢 **Normal Blood Oxygen**: Your blood oxygen levels are within the normal range.",
+    "heart_bradycardia": "❤️ **Bradycardia**: Abnormally low heart rate detected. Consider seeking medical advice.",
+    "heart_normal": "🟢 **Normal Heart Rate**: Your heart rate is within the normal range.",
+    "heart_tachycardia": "❤️ **Tachycardia**: Abnormally high heart rate detected. It might be beneficial to engage in relaxation techniques or consult a healthcare provider.",
+    "snoring_heavy": "😴 **Heavy Snoring**: Persistent heavy snoring may indicate sleep apnea. Consider consulting a sleep specialist.",
+    "snoring_mild": "😴 **Mild Snoring**: Moderate snoring can disrupt your sleep. Maintaining a healthy weight and avoiding alcohol before bedtime might help.",
+    "snoring_normal": "✅ **Normal Snoring**: Your snoring rate is within the normal range.",
+    "respiration_slow": "🌬️ **Slow Respiration**: A lower respiration rate may indicate hypoventilation. Consider breathing exercises.",
+    "respiration_rapid": "🌬️ **Rapid Respiration**: A higher respiration rate may indicate hyperventilation. Practice relaxation techniques.",
+    "respiration_normal": "🟢 **Normal Respiration Rate**: Your respiration rate is within the normal range.",
+    "temperature_low": "🌡️ **Low Body Temperature**: Consider dressing warmly and consulting a healthcare provider if you feel unwell.",
+    "temperature_high": "🌡️ **High Body Temperature**: Stay hydrated and consider seeking medical attention if the temperature persists.",
+    "temperature_normal": "🟢 **Normal Body Temperature**: Your body temperature is within the normal range.",
+    "limb_severe": "🦵 **Severe Limb Movement**: Excessive limb movement during sleep may affect sleep quality. Consider relaxation techniques before bedtime.",
+    "limb_moderate": "🦵 **Moderate Limb Movement**: Some limb movement is normal, but excessive movement can disrupt sleep.",
+    "limb_normal": "✅ **Normal Limb Movement**: Your limb movement during sleep is within the normal range.",
+    "eye_high_rem": "👁️ **High REM Activity**: Elevated eye movement during sleep can be associated with stress. Consider stress-reduction techniques.",
+    "eye_normal": "🟢 **Normal Eye Movement**: Your eye movement during sleep is within the normal range.",
+    "sleep_deprivation": "🛌 **Sleep Deprivation**: Aim for 7-9 hours of sleep for optimal health. Consider establishing a regular sleep schedule.",
+    "sleep_excessive": "🛌 **Excessive Sleep**: Consistently sleeping more than 9 hours may affect your daily routine. Aim for 7-9 hours of sleep.",
+    "sleep_normal": "🟢 **Normal Sleeping Hours**: Your sleep duration is within the recommended range.",
+}
+
+_compiled_rules = []
+for _group, _feature, _edges, _rule_ids, _nan_rule in recommendation_rules:
+    if list(_edges) != sorted(_edges) or len(_rule_ids) != len(_edges) + 1:
+        raise ValueError(f"Bad recommendation rule bands for {_group}")
+    _categories = list(dict.fromkeys(_rule_ids))
+    _missing_text = [rule_id for rule_id in _categories if rule_id not in recommendation_text]
+    if _missing_text or _nan_rule not in _categories:
+        raise ValueError(f"Recommendation rules for {_group} reference unknown rule IDs")
+    _compiled_rules.append((
+        _group, _feature, np.asarray(_edges, dtype=float),
+        np.array([_categories.index(rule_id) for rule_id in _rule_ids], dtype=np.int8),
+        _categories.index(_nan_rule), _categories,
+    ))
+
+
+def rule_codes(values, edges, codes, nan_code):
+    values = np.asarray(values, dtype=float)
+    result = codes[np.searchsorted(edges, values, side='left')]
+    return np.where(np.isnan(values), nan_code, result).astype(np.int8)
+
+
+def recommend(values):
+    """Rule IDs for one person; ``values`` maps feature name to value."""
+    return [
+        categories[int(rule_codes(values[feature], edges, codes, nan_code))]
+        for _, feature, edges, codes, nan_code, categories in _compiled_rules
+    ]
+
+
+def recommend_frame(df):
+    """``<group> Recommendation`` categorical columns of rule IDs for every row of ``df``."""
+    import pandas as pd
+
+    columns = {}
+    for group, feature, edges, codes, nan_code, categories in _compiled_rules:
+        columns[f"{group} Recommendation"] = pd.Categorical.from_codes(
+            rule_codes(df[feature].to_numpy(dtype=float), edges, codes, nan_code), categories=categories
+        )
+    return pd.DataFrame(columns, index=df.index)
@@ -0,0 +1,283 @@
+"""Shadow scoring: run a candidate model next to the production one.
+
+Set ``STRESS_SHADOW_MODEL`` to a registry version (see model_registry.py) or a
+model file and every prediction made by the Predict button, or by batch and
+streaming scoring with ``--shadow-model``, is also handed to a
+``ShadowScorer``.  It queues the inputs together with the production
+predictions and scores them with the candidate on its own background thread,
+so the user-facing prediction never waits for it; when the queue is full the
+work is dropped (and counted) rather than blocking.  Only the production
+result is ever shown.  In the app the candidate is also loaded on that
+thread, so a missing or broken candidate is logged and turns shadowing off
+instead of reaching the page.
+
+``close(timeout)`` scores what is still queued for at most ``timeout``
+seconds and drops the rest, so a job never waits long for its shadow.
+
+Each scored batch appends one JSON line to ``STRESS_SHADOW_LOG`` (default
+``shadow_log.jsonl``) with both versions, both latencies, the label
+distributions, the number of disagreements and a few disagreeing rows.
+
+Usage:
+    python -m shadow report [shadow_log.jsonl]
+"""
+import argparse
+import functools
+import json
+import logging
+import os
+import queue
+import sys
+import threading
+import time
+from collections import Counter
+
+import numpy as np
+
+from stress_model import describe_predictions, feature_names, load_model, stress_descriptions
+
+default_log_path = os.environ.get("STRESS_SHADOW_LOG", "shadow_log.jsonl")
+
+# Disagreeing rows written out per logged batch
+MAX_EXAMPLES = 20
+
+# Seconds a finished batch job keeps scoring its queued shadow work before dropping it
+CLOSE_TIMEOUT = 5.0
+
+logger = logging.getLogger("stress_shadow")
+
+_stop = object()
+
+
+def _label_counts(predictions):
+    classes, counts = np.unique(predictions, return_counts=True)
+    return dict(zip(describe_predictions(classes).tolist(), counts.tolist()))
+
+
+def _pair_counts(production, candidate):
+    pairs, counts = np.unique(np.column_stack([production, candidate]), axis=0, return_counts=True)
+    return {f"{p},{c}": n for (p, c), n in zip(pairs.tolist(), counts.tolist())}
+
+
+class ShadowScorer:
+    def __init__(self, path, version=None, log_path=default_log_path, loader=load_model, max_queue=256,
+                 model=None, resolve=None):
+        """Score queued batches with the model at ``path`` on a background thread.
+
+        Unless an already loaded ``model`` is given the candidate is loaded by
+        that thread too, so creating a scorer costs nothing.  ``resolve``, if
+        given, is called there first and returns the ``(path, version)`` to
+        load.  If either fails the error is logged and later batches are
+        dropped.
+        """
+        self.path = path
+        self.version = version or path
+        self.log_path = log_path
+        self.dropped = 0
+        self._loader = loader
+        self._model = model
+        self._resolve = resolve
+        self._queue = queue.Queue(max_queue)
+        self._lock = threading.Lock()
+        # Past this time.monotonic() value queued batches are dropped instead of scored
+        self._deadline = None
+        self._thread = threading.Thread(target=self._run, name="shadow-scorer", daemon=True)
+        self._thread.start()
+
+    def submit(self, X, production_predictions, production_version, production_seconds):
+        """Queue a batch for the candidate; never blocks."""
+        if not self._thread.is_alive():
+            self.dropped += 1
+            return False
+        try:
+            self._queue.put_nowait((
+                np.asarray(X, dtype=float).reshape(-1, len(feature_names)),
+                np.asarray(production_predictions), production_version, production_seconds, time.time(),
+            ))
+        except queue.Full:
+            self.dropped += 1
+            return False
+        return True
+
+    def close(self, timeout=None):
+        """Score what is still queued for at most ``timeout`` seconds (None: all of it),
+        drop the rest and stop the thread."""
+        if timeout is not None:
+            self._deadline = time.monotonic() + timeout
+        # The thread may have died (e.g. the model did not load) and stopped draining the queue
+        while self._thread.is_alive():
+            try:
+                self._queue.put(_stop, timeout=0.1)
+                break
+            except queue.Full:
+                continue
+        self._thread.join()
+
+    def _run(self):
+        model = self._model
+        if model is None:
+            try:
+                if self._resolve is not None:
+                    self.path, self.version = self._resolve()
+                model = self._loader(self.path)
+            except Exception:
+                logger.exception("Could not load the shadow model %s", self.path)
+                return
+        while True:
+            item = self._queue.get()
+            if item is _stop:
+                return
+            if self._deadline is not None and time.monotonic() > self._deadline:
+                self.dropped += 1
+                continue
+            try:
+                self._score(model, *item)
+            except Exception:
+                logger.exception("Shadow scoring failed")
+
+    def _score(self, model, X, production, production_version, production_seconds, submitted_at):
+        start = time.perf_counter()
+        candidate = model.predict(X)
+        candidate_seconds = time.perf_counter() - start
+
+        disagree = np.flatnonzero(candidate != production)
+        record = {
+            "time": submitted_at,
+            "rows": len(X),
+            "production_version": production_version,
+            "candidate_version": self.version,
+            "production_ms": production_seconds * 1000,
+            "candidate_ms": candidate_seconds * 1000,
+            "disagreements": len(disagree),
+            "production_labels": _label_counts(production),
+            "candidate_labels": _label_counts(candidate),
+            # Pairs of (production, candidate) classes, for the confusion matrix of the report
+            "pairs": _pair_counts(production, candidate),
+            "examples": [
+                {"input": dict(zip(feature_names, X[i].tolist())),
+                 "production": int(production[i]), "candidate": int(candidate[i])}
+                for i in disagree[:MAX_EXAMPLES]
+            ],
+            "dropped": self.dropped,
+        }
+        with self._lock, open(self.log_path, "a") as f:
+            f.write(json.dumps(record) + "\n")
+
+
+def shadow_from_env(log_path=default_log_path, loader=load_model):
+    """A ``ShadowScorer`` for ``STRESS_SHADOW_MODEL``, or None when it is unset.
+
+    Meant for the app: the candidate is checked and loaded on the scorer's
+    thread, so it neither delays the first page nor, when it is broken,
+    breaks it.
+    """
+    candidate = os.environ.get("STRESS_SHADOW_MODEL")
+    return shadow_for(candidate, log_path, loader, preload=False) if candidate else None
+
+
+def resolve_candidate(candidate):
+    """``(path, version)`` of a registry version name or a model file path.
+
+    A registry version's checksum is verified.
+    """
+    from model_registry import ModelRegistry, file_version
+
+    registry = ModelRegistry()
+    if candidate in registry.versions():
+        registry.verify(candidate)
+        return registry.model_path(candidate), candidate
+    return candidate, file_version(candidate)
+
+
+def shadow_for(candidate, log_path=default_log_path, loader=load_model, max_queue=256, preload=True):
+    """A ``ShadowScorer`` for a registry version name or a model file path.
+
+    With ``preload`` the candidate is resolved and loaded here, so a broken
+    model fails a batch job loudly up front.  Without it both happen on the
+    scorer's thread and a broken candidate only turns shadowing off.
+    """
+    if not preload:
+        return ShadowScorer(candidate, log_path=log_path, loader=loader, max_queue=max_queue,
+                            resolve=functools.partial(resolve_candidate, candidate))
+    path, version = resolve_candidate(candidate)
+    return ShadowScorer(path, version, log_path, loader, max_queue, model=loader(path))
+
+
+def read_log(path):
+    with open(path) as f:
+        return [json.loads(line) for line in f if line.strip()]
+
+
+def build_report(records):
+    """Aggregate shadow log records into a comparison of the two models."""
+    if not records:
+        return {"batches": 0}
+    rows = sum(r["rows"] for r in records)
+    disagreements = sum(r["disagreements"] for r in records)
+    production_labels, candidate_labels, pairs = Counter(), Counter(), Counter()
+    for r in records:
+        production_labels.update(r["production_labels"])
+        candidate_labels.update(r["candidate_labels"])
+        pairs.update(r["pairs"])
+
+    classes = sorted(stress_descriptions)
+    confusion = [[pairs.get(f"{p},{c}", 0) for c in classes] for p in classes]
+    production_ms = np.array([r["production_ms"] / r["rows"] for r in records])
+    candidate_ms = np.array([r["candidate_ms"] / r["rows"] for r in records])
+    return {
+        "batches": len(records),
+        "rows": rows,
+        "production_versions": sorted({str(r["production_version"]) for r in records}),
+        "candidate_versions": sorted({str(r["candidate_version"]) for r in records}),
+        "agreement": 1 - disagreements / rows if rows else None,
+        "disagreements": disagreements,
+        "dropped_batches": max(r.get("dropped", 0) for r in records),
+        "production_labels": dict(production_labels),
+        "candidate_labels": dict(candidate_labels),
+        "confusion_classes": classes,
+        "confusion": confusion,
+        "production_ms_per_row_p50": float(np.percentile(production_ms, 50)),
+        "production_ms_per_row_p95": float(np.percentile(production_ms, 95)),
+        "candidate_ms_per_row_p50": float(np.percentile(candidate_ms, 50)),
+        "candidate_ms_per_row_p95": float(np.percentile(candidate_ms, 95)),
+    }
+
+
+def print_report(report):
+    if not report["batches"]:
+        print("No shadow records.")
+        return
+    print(f"Production {', '.join(map(str, report['production_versions']))} vs "
+          f"candidate {', '.join(map(str, report['candidate_versions']))}")
+    print(f"{report['rows']:,} rows in {report['batches']:,} batches, agreement {report['agreement']:.4%} "
+          f"({report['disagreements']:,} disagreements, {report['dropped_batches']:,} batches dropped)")
+    print(f"Latency per row (p50/p95 ms): production {report['production_ms_per_row_p50']:.4f}/"
+          f"{report['production_ms_per_row_p95']:.4f}, candidate {report['candidate_ms_per_row_p50']:.4f}/"
+          f"{report['candidate_ms_per_row_p95']:.4f}")
+    print(f"{'Label':<16}{'production':>12}{'candidate':>12}")
+    for label in [stress_descriptions[c] for c in report["confusion_classes"]]:
+        production, candidate = report["production_labels"].get(label, 0), report["candidate_labels"].get(label, 0)
+        print(f"{label:<16}{production:>12,}{candidate:>12,}")
+    print("Confusion (rows: production, columns: candidate)")
+    for c, row in zip(report["confusion_classes"], report["confusion"]):
+        print(f"{stress_descriptions[c]:<16}" + "".join(f"{n:>10,}" for n in row))
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Compare the production model with a shadow candidate.")
+    commands = parser.add_subparsers(dest="command", required=True)
+    report = commands.add_parser("report", help="summarize a shadow log")
+    report.add_argument("log", nargs="?", default=default_log_path)
+    report.add_argument("--json", action="store_true", help="print the report as JSON")
+    args = parser.parse_args(argv)
+
+    result = build_report(read_log(args.log))
+    if args.json:
+        print(json.dumps(result, indent=2))
+    else:
+        print_report(result)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
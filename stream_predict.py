@@ -0,0 +1,156 @@
+"""Score CSV or Parquet files that are too big to load at once.
+
+Usage:
+    python -m stream_predict input.parquet output.csv [--chunk-size 200000]
+
+The input is read and scored one chunk at a time and each scored chunk is
+appended to the output file, so memory use depends on the chunk size only.
+Input and output formats are picked from the file extension (.csv, .csv.gz
+or .parquet).  Parquet needs ``pyarrow`` installed.  CSV input columns are
+copied to the output as the text they were read as.
+"""
+import argparse
+import sys
+import time
+
+import pandas as pd
+
+from batch_predict import INVALID_LABEL, score_frame
+from model_registry import resolve_model
+from shadow import CLOSE_TIMEOUT, shadow_for
+from stress_model import load_model
+from worker_pool import WorkerPool
+
+
+def _is_parquet(path):
+    return str(path).lower().endswith((".parquet", ".pq"))
+
+
+def _require_pyarrow():
+    try:
+        import pyarrow
+        import pyarrow.parquet
+    except ImportError:
+        raise ImportError("Parquet support requires pyarrow (pip install pyarrow).") from None
+    return pyarrow
+
+
+def iter_chunks(path, chunk_size):
+    """Yield DataFrames of at most ``chunk_size`` rows from a CSV or Parquet file."""
+    if _is_parquet(path):
+        pa = _require_pyarrow()
+        parquet_file = pa.parquet.ParquetFile(path)
+        for batch in parquet_file.iter_batches(batch_size=chunk_size):
+            yield batch.to_pandas()
+    else:
+        # Read as text, so a stray value cannot give a column another type in
+        # one chunk than in the others; validation parses the features itself
+        with pd.read_csv(path, chunksize=chunk_size, dtype=str) as reader:
+            yield from reader
+
+
+class ChunkWriter:
+    """Append scored chunks to a CSV or Parquet file.
+
+    A Parquet file has one schema, taken from the first chunk; later chunks
+    are converted to it.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self._parquet_writer = None
+        self._wrote_header = False
+
+    def write(self, df):
+        if _is_parquet(self.path):
+            pa = _require_pyarrow()
+            if self._parquet_writer is None:
+                table = pa.Table.from_pandas(df, preserve_index=False)
+                self._parquet_writer = pa.parquet.ParquetWriter(self.path, table.schema)
+            else:
+                table = pa.Table.from_pandas(df, schema=self._parquet_writer.schema, preserve_index=False)
+            self._parquet_writer.write_table(table)
+        else:
+            df.to_csv(self.path, mode="a" if self._wrote_header else "w",
+                      header=not self._wrote_header, index=False)
+            self._wrote_header = True
+
+    def close(self):
+        if self._parquet_writer is not None:
+            self._parquet_writer.close()
+            self._parquet_writer = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+def stream_predict(model, input_path, output_path, chunk_size=200_000, report=None, interpret=False,
+                   recommend=False, errors=False, model_version=None, shadow=None, confidence=False):
+    """Score ``input_path`` chunk by chunk into ``output_path``.
+
+    ``report`` is called after every chunk with ``(rows_done, invalid_rows, seconds)``.
+    Returns the same triple for the whole run.
+    """
+    rows = invalid = 0
+    start = time.perf_counter()
+    with ChunkWriter(output_path) as writer:
+        for chunk in iter_chunks(input_path, chunk_size):
+            scored = score_frame(model, chunk, chunk_size, interpret, recommend, errors, model_version, shadow,
+                                 confidence)
+            writer.write(scored)
+            rows += len(scored)
+            invalid += int((scored["Stress Level"] == INVALID_LABEL).sum())
+            if report is not None:
+                report(rows, invalid, time.perf_counter() - start)
+    return rows, invalid, time.perf_counter() - start
+
+
+def print_progress(rows, invalid, seconds):
+    rate = rows / seconds if seconds > 0 else 0.0
+    print(f"{rows:,} rows ({invalid:,} invalid) in {seconds:.1f}s - {rate:,.0f} rows/s", file=sys.stderr)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Streaming stress level prediction for large CSV/Parquet files.")
+    parser.add_argument("input", help="CSV or Parquet file with the 12 feature columns")
+    parser.add_argument("output", help="CSV or Parquet file to write the scored rows to")
+    parser.add_argument("--model", help="path to the trained model (default: the active registry version)")
+    parser.add_argument("--workers", type=int, default=0,
+                        help="predict in this many worker processes (default: in this process)")
+    parser.add_argument("--chunk-size", type=int, default=200_000, help="rows read and scored per chunk")
+    parser.add_argument("--interpret", action="store_true", help="add the interpretation band columns")
+    parser.add_argument("--recommend", action="store_true", help="add the recommendation rule ID columns")
+    parser.add_argument("--errors", action="store_true", help="add an Invalid Fields column naming the bad inputs")
+    parser.add_argument("--confidence", action="store_true",
+                        help="add the Confidence, Confidence Margin and per-level probability columns")
+    parser.add_argument("--shadow-model", help="registry version or model file to shadow score against, see shadow.py")
+    parser.add_argument("--quiet", action="store_true", help="only print the final summary")
+    args = parser.parse_args(argv)
+
+    path, version = resolve_model(args.model)
+    model = WorkerPool(path, args.workers) if args.workers > 0 else load_model(path)
+    # Only a few chunks are queued for the shadow model; it skips chunks rather than slow the run down
+    shadow = shadow_for(args.shadow_model, max_queue=4) if args.shadow_model else None
+    try:
+        rows, invalid, seconds = stream_predict(
+            model, args.input, args.output, args.chunk_size,
+            report=None if args.quiet else print_progress, interpret=args.interpret,
+            recommend=args.recommend, errors=args.errors, model_version=version, shadow=shadow,
+            confidence=args.confidence,
+        )
+    finally:
+        if args.workers > 0:
+            model.close()
+        if shadow is not None:
+            # The output is complete at this point; what the candidate has not scored yet is dropped
+            shadow.close(CLOSE_TIMEOUT)
+    print("Done:", end=" ", file=sys.stderr)
+    print_progress(rows, invalid, seconds)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
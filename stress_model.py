@@ -0,0 +1,134 @@
+"""Model, feature and label definitions shared by the Streamlit app and the
+headless scoring tools.
+
+Nothing in here imports Streamlit, so batch jobs can use it directly.
+"""
+import os
+
+import numpy as np
+
+# Path to the trained Gradient Boosting model, used when the model registry
+# (see model_registry.py) has no active version
+model_path = os.environ.get("STRESS_MODEL_PATH", 'gradient_boosting_model.pkl')
+
+# Define feature names (ensure these match the order of your model's input features)
+feature_names = [
+    'Age', 'Marital Status', 'Gender', 'BMI', 'Snoring Rate',
+    'Respiration Rate', 'Body Temperature', 'Limb Movement',
+    'Blood Oxygen', 'Eye Movement', 'Sleeping Hours', 'Heart Rate'
+]
+
+# Allowed (min, max) for each feature, same limits as the Predict button checks.
+# validation.py builds the input schema from these declarations
+feature_ranges = {
+    'Age': (18, 80),
+    'Marital Status': (0, 1),
+    'Gender': (0, 1),
+    'BMI': (18.0, 40.0),
+    'Snoring Rate': (0, 50),
+    'Respiration Rate': (0, 50),
+    'Body Temperature': (60.0, 110.0),
+    'Limb Movement': (0, 35),
+    'Blood Oxygen': (60, 110),
+    'Eye Movement': (0, 35),
+    'Sleeping Hours': (0, 24),
+    'Heart Rate': (30, 100),
+}
+
+feature_units = {
+    'Body Temperature': ' °F',
+}
+
+# Features that only take whole numbers; all others are floats
+feature_dtypes = {
+    'Marital Status': 'int',
+    'Gender': 'int',
+}
+
+# Optional sensor readings that are treated as 0 when left blank
+optional_features = ['Snoring Rate', 'Limb Movement', 'Eye Movement']
+
+stress_descriptions = {
+    0: "No Stress",
+    1: "Low Stress",
+    2: "Moderate Stress",
+    3: "High Stress",
+    4: "Max Stress"
+}
+
+colors = ['#d0f0c0', '#b0e57c', '#f2b700', '#f77f00', '#d62839']
+
+
+def load_model(path=model_path, compiled=None):
+    """Load the pickled model.
+
+    With ``compiled=True`` (or ``STRESS_COMPILED_MODEL=1`` in the environment
+    when ``compiled`` is None) the array-based evaluator from compiled_model.py
+    is returned instead; it gives the same predictions and is memory-mapped
+    from the exported artifact when one is up to date (see model_artifact.py).
+    """
+    if not os.path.exists(path):
+        raise FileNotFoundError(f"Model file '{path}' not found.")
+    if compiled is None:
+        compiled = os.environ.get("STRESS_COMPILED_MODEL") == "1"
+    if compiled:
+        from model_artifact import load_fast
+        return load_fast(path)
+
+    # Deferred so scikit-learn is not imported until a model is loaded
+    import joblib
+
+    return joblib.load(path)
+
+
+def describe_predictions(predictions):
+    """Map an array of predicted classes to their ``stress_descriptions`` labels."""
+    lookup = np.array([stress_descriptions.get(i, "Unknown") for i in range(len(colors))], dtype=object)
+    predictions = np.asarray(predictions, dtype=int)
+    labels = np.full(predictions.shape, "Unknown", dtype=object)
+    known = (predictions >= 0) & (predictions < len(lookup))
+    labels[known] = lookup[predictions[known]]
+    return labels
+
+
+def outputs_from_scores(raw, classes):
+    """Labels, class probabilities and confidence margins from ``decision_function`` scores.
+
+    The labels are the ones ``predict`` gives and the probabilities match
+    ``predict_proba``, but the ensemble only has to be evaluated once.  The
+    margin is the gap between the two most likely classes' probabilities.
+    """
+    raw = np.asarray(raw, dtype=float)
+    if raw.ndim == 1:
+        raw = raw[:, None]
+    if raw.shape[1] == 1:
+        # Binary models score only the positive class
+        positive = 1 / (1 + np.exp(-raw[:, 0]))
+        probabilities = np.column_stack([1 - positive, positive])
+        encoded = (raw[:, 0] >= 0).astype(int)
+    else:
+        exp = np.exp(raw - raw.max(axis=1, keepdims=True))
+        probabilities = exp / exp.sum(axis=1, keepdims=True)
+        encoded = np.argmax(raw, axis=1)
+    return np.asarray(classes)[encoded], probabilities, confidence_margin(probabilities)
+
+
+def confidence_margin(probabilities):
+    top_two = np.sort(probabilities, axis=1)[:, -2:]
+    return top_two[:, 1] - top_two[:, 0]
+
+
+def predict_with_confidence(model, X, chunk_size=100_000):
+    """``(labels, probabilities, margins)`` for ``X`` from a single pass over the ensemble.
+
+    Works for one row or a batch; large batches are scored one chunk at a time.
+    """
+    X = np.asarray(X, dtype=float).reshape(-1, len(feature_names))
+    if not len(X):
+        n_classes = len(model.classes_)
+        return np.asarray(model.classes_)[:0], np.empty((0, n_classes)), np.empty(0)
+    parts = [
+        outputs_from_scores(model.decision_function(X[start:start + chunk_size]), model.classes_)
+        for start in range(0, len(X), chunk_size)
+    ]
+    return tuple(np.concatenate(arrays) for arrays in zip(*parts))
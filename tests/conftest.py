@@ -0,0 +1,32 @@
+import os
+import sys
+
+import pytest
+
+# The modules live at the top of the repository, which is not a package
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+
+@pytest.fixture(scope="session")
+def model_file():
+    """The trained model, found from the repository whatever the working directory."""
+    from stress_model import model_path
+
+    return os.path.join(ROOT, model_path)
+
+
+@pytest.fixture(scope="session")
+def model(model_file):
+    """The scikit-learn model, unpickled once for the whole run."""
+    from stress_model import load_model
+
+    return load_model(model_file, compiled=False)
+
+
+@pytest.fixture(scope="session")
+def compiled(model):
+    """The model compiled by ``CompiledGradientBoosting.from_sklearn``."""
+    from compiled_model import CompiledGradientBoosting
+
+    return CompiledGradientBoosting.from_sklearn(model)
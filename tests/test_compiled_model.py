@@ -0,0 +1,32 @@
+"""CompiledGradientBoosting against the scikit-learn model it was compiled from."""
+import pytest
+
+from compiled_model import boundary_inputs, check_parity, random_inputs
+
+
+@pytest.mark.parametrize("seed", [0, 1, 2])
+def test_random_rows_match(model, compiled, seed):
+    assert check_parity(model, compiled, random_inputs(20_000, seed)) == 0
+
+
+@pytest.mark.parametrize("seed", [0, 1])
+def test_split_boundary_rows_match(model, compiled, seed):
+    # Exactly on a threshold goes left, the next float32 up goes right
+    assert check_parity(model, compiled, boundary_inputs(compiled, seed)) == 0
+
+
+@pytest.mark.parametrize("n_rows", [1, 31, 32, 600])
+def test_batch_sizes_match(model, compiled, n_rows):
+    # Below 32 rows the stages are summed with cumsum, above 512 in chunks
+    assert check_parity(model, compiled, random_inputs(n_rows, 3)) == 0
+
+
+def test_single_row_is_accepted(model, compiled):
+    x = random_inputs(1, 4)[0]
+    assert compiled.predict(x) == model.predict(x.reshape(1, -1))
+
+
+def test_tree_subset_contributions(compiled):
+    X = random_inputs(100, 5)
+    trees = [0, 7, 250, compiled.n_trees - 1]
+    assert (compiled.tree_contributions(X, trees) == compiled.tree_contributions(X)[trees]).all()
@@ -0,0 +1,33 @@
+"""EarlyExitPredictor against the scikit-learn model it was compiled from."""
+import numpy as np
+
+from compiled_model import random_inputs
+from early_exit import EarlyExitPredictor, _margin_and_encoded, calibrate, fit_thresholds, split_sample, staged_scores
+
+CHECKPOINTS = list(range(10, 100, 10))
+
+
+def test_never_exiting_matches_full_model(model, compiled):
+    X = random_inputs(5000, 6)
+    predictor = EarlyExitPredictor(compiled, CHECKPOINTS, [np.inf] * len(CHECKPOINTS))
+    raw, stages = predictor.staged_exit(X)
+    assert (stages == compiled.n_stages).all()
+    np.testing.assert_array_equal(raw, model.decision_function(X))
+
+
+def test_calibrated_thresholds_hold_on_held_out_rows(model, compiled):
+    X_fit, X_check = split_sample(random_inputs(20_000, 7), 0.3, seed=7)
+    staged, final_raw = staged_scores(model, X_fit, CHECKPOINTS)
+    _, expected = _margin_and_encoded(model.decision_function(X_check))
+
+    # Calibrated to the fitted sample, the target holds there by construction
+    predictor = EarlyExitPredictor(compiled, CHECKPOINTS, calibrate(staged, final_raw, 0.99))
+    raw, _ = predictor.staged_exit(X_fit)
+    assert (_margin_and_encoded(raw)[1] == _margin_and_encoded(final_raw)[1]).mean() >= 0.99
+
+    predictor, agreement = fit_thresholds(compiled, CHECKPOINTS, staged, final_raw, X_check, expected, 0.99)
+    raw, stages = predictor.staged_exit(X_check)
+    assert agreement >= 0.99
+    assert (_margin_and_encoded(raw)[1] == expected).mean() == agreement
+    # Confident rows do stop early
+    assert stages.mean() < compiled.n_stages
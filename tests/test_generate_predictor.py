@@ -0,0 +1,37 @@
+"""The generated NumPy-only predictor module against the pickled model."""
+import numpy as np
+import pytest
+
+from compiled_model import boundary_inputs, random_inputs
+from generate_predictor import check_parity, generate_source, import_module
+from stress_model import feature_names
+
+
+@pytest.fixture(scope="module")
+def generated(model, model_file, tmp_path_factory):
+    path = tmp_path_factory.mktemp("generated") / "generated_predictor.py"
+    path.write_text(generate_source(model, model_file))
+    return import_module(str(path))
+
+
+def test_module_describes_the_model(model, generated):
+    assert list(generated.FEATURE_NAMES) == list(feature_names)
+    assert (generated.classes_ == model.classes_).all()
+
+
+def test_no_mismatches(model, compiled, generated):
+    X = np.concatenate([
+        random_inputs(20_000, 0),
+        boundary_inputs(compiled, 0),
+    ])
+    assert check_parity(model, generated, X) == 0
+
+
+def test_single_row(model, generated):
+    x = random_inputs(1, 1)[0]
+    assert generated.predict(x) == model.predict(x.reshape(1, -1))
+
+
+def test_rejects_wrong_width(generated):
+    with pytest.raises(ValueError):
+        generated.predict(np.zeros((1, len(feature_names) - 1)))
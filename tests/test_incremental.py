@@ -0,0 +1,32 @@
+"""IncrementalScorer against the scikit-learn model it was compiled from."""
+import numpy as np
+import pytest
+
+from incremental import IncrementalScorer, random_edits
+from stress_model import feature_names
+
+
+@pytest.mark.parametrize("seed", [0, 1])
+def test_random_edits_match(model, compiled, seed):
+    X = random_edits(2000, seed)
+    scorer = IncrementalScorer(compiled)
+    raw = np.array([scorer.score(x) for x in X])
+    np.testing.assert_array_equal(raw, model.decision_function(X))
+
+
+def test_unchanged_row_reuses_scores(model, compiled):
+    X = random_edits(1, 2)
+    scorer = IncrementalScorer(compiled)
+    scorer.score(X[1])
+    raw = scorer.score(X[1])
+    assert scorer.splits_flipped == 0
+    np.testing.assert_array_equal(raw, model.decision_function(X[1:])[0])
+
+
+def test_most_splits_flipped(model, compiled):
+    # Below every threshold, then above every one: all outcomes change
+    X = np.array([np.full(len(feature_names), -1e9), np.full(len(feature_names), 1e9)])
+    scorer = IncrementalScorer(compiled)
+    raw = np.array([scorer.score(x) for x in X])
+    assert scorer.splits_flipped > len(compiled.split_feature) // 2
+    np.testing.assert_array_equal(raw, model.decision_function(X))
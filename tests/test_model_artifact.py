@@ -0,0 +1,29 @@
+"""Freshness checks of exported model artifacts."""
+import numpy as np
+
+from compiled_model import random_inputs
+from compress_model import compress
+from model_artifact import export_artifact, is_fresh, load_artifact, load_fast
+
+
+def test_export_is_fresh(compiled, model_file, tmp_path):
+    export_artifact(compiled, model_file, str(tmp_path / "full"))
+    assert is_fresh(str(tmp_path / "full"), model_file)
+
+
+def test_lookup_tables_are_memory_mapped(compiled, model_file, tmp_path):
+    export_artifact(compiled, model_file, str(tmp_path / "full"))
+    loaded = load_artifact(str(tmp_path / "full"))
+    # Shared through the page cache rather than built again in every process
+    assert isinstance(loaded._code_weights, np.memmap)
+    assert isinstance(loaded._leaf_table, np.memmap)
+    X = random_inputs(2000)
+    np.testing.assert_array_equal(loaded.decision_function(X), compiled.decision_function(X))
+
+
+def test_compressed_variant_is_never_fresh(compiled, model_file, tmp_path):
+    variant = compress(compiled, 25, float32=True)
+    export_artifact(variant, model_file, str(tmp_path / "variant"), compression={"stages": 25})
+    assert not is_fresh(str(tmp_path / "variant"), model_file)
+    # Found where the full model's artifact belongs, the pickle is used instead
+    assert load_fast(model_file, str(tmp_path / "variant")).n_stages == compiled.n_stages
@@ -0,0 +1,39 @@
+"""Chunked scoring of files too big to load at once."""
+import numpy as np
+import pandas as pd
+import pytest
+
+from batch_predict import INVALID_LABEL, score_frame
+from compiled_model import random_inputs
+from stream_predict import stream_predict
+from stress_model import feature_names
+
+
+@pytest.fixture
+def input_csv(tmp_path):
+    df = pd.DataFrame(random_inputs(300, 0), columns=feature_names)
+    df["Age"] = df["Age"].astype(int).astype(object)
+    df["Marital Status"] = df["Marital Status"].astype(int).astype(object)
+    # Yes/No only after the first chunk, and a bad Age in the last one
+    df.loc[150:, "Marital Status"] = df.loc[150:, "Marital Status"].map({0: "No", 1: "Yes"})
+    df.loc[250, "Age"] = "abc"
+    df.loc[120, "Snoring Rate"] = np.nan
+    path = tmp_path / "input.csv"
+    df.to_csv(path, index=False)
+    return path
+
+
+@pytest.mark.parametrize("suffix", [".csv", ".parquet"])
+def test_bad_value_in_a_later_chunk(model, input_csv, tmp_path, suffix):
+    if suffix == ".parquet":
+        pytest.importorskip("pyarrow")
+    output = tmp_path / f"output{suffix}"
+    rows, invalid, _ = stream_predict(model, input_csv, output, chunk_size=100, interpret=True, recommend=True,
+                                      errors=True, confidence=True)
+    assert (rows, invalid) == (300, 1)
+
+    scored = pd.read_parquet(output) if suffix == ".parquet" else pd.read_csv(output)
+    expected = score_frame(model, pd.read_csv(input_csv, dtype=str), confidence=True)
+    assert len(scored) == 300
+    assert scored.loc[250, "Stress Level"] == INVALID_LABEL
+    assert (scored["Stress Level"].to_numpy() == expected["Stress Level"].to_numpy()).all()
@@ -0,0 +1,165 @@
+"""Columnar validation of the 12 model inputs, shared by the app, the batch
+tools and the HTTP service.
+
+``feature_schema`` gives every feature its dtype, allowed range and blank
+policy.  The ``validate_*`` functions turn a batch (or a single row) into the
+float matrix the model takes and check all of it in one vectorised pass.  The
+returned ``Validation`` holds an error code per row and field, so every
+problem of every row is reported instead of only the first one.
+"""
+from collections import namedtuple
+
+import numpy as np
+
+from metrics import metrics
+from stress_model import feature_dtypes, feature_names, feature_ranges, feature_units, optional_features
+
+# ``blank`` is the value a blank (or unreadable) input is replaced with, None if the input is required
+FieldSpec = namedtuple("FieldSpec", ["dtype", "low", "high", "unit", "blank"])
+
+feature_schema = {
+    name: FieldSpec(
+        feature_dtypes.get(name, "float"), *feature_ranges[name], feature_units.get(name, ""),
+        0.0 if name in optional_features else None,
+    )
+    for name in feature_names
+}
+
+# Sidebar option labels accepted in place of the encoded 0/1 values
+option_values = {
+    'Marital Status': {"Yes": 1, "No": 0},
+    'Gender': {"Male": 1, "Female": 0},
+}
+
+# Error codes stored in ``Validation.codes``
+OK, MISSING, NOT_A_NUMBER, NOT_AN_INTEGER, BELOW_MIN, ABOVE_MAX = range(6)
+
+_low = np.array([feature_schema[name].low for name in feature_names], dtype=float)
+_high = np.array([feature_schema[name].high for name in feature_names], dtype=float)
+_integer = np.array([feature_schema[name].dtype == "int" for name in feature_names])
+_has_blank = np.array([feature_schema[name].blank is not None for name in feature_names])
+_blank = np.array([feature_schema[name].blank or 0.0 for name in feature_names], dtype=float)
+
+
+def error_message(name, code):
+    spec = feature_schema[name]
+    if code in (BELOW_MIN, ABOVE_MAX):
+        return f"Please insert the {name} within the range ({spec.low}-{spec.high}{spec.unit})."
+    if code == MISSING:
+        return f"{name} is required."
+    if code == NOT_A_NUMBER:
+        return f"{name} must be a number."
+    return f"{name} must be a whole number."
+
+
+class Validation:
+    """Result of validating a batch: ``codes[row, field]`` is one of the error codes above."""
+
+    def __init__(self, codes):
+        self.codes = codes
+
+    @property
+    def invalid(self):
+        """Per-row, per-field error mask."""
+        return self.codes != OK
+
+    @property
+    def valid(self):
+        """Rows without any error."""
+        return ~self.invalid.any(axis=1)
+
+    def field_mask(self, name):
+        return self.invalid[:, feature_names.index(name)]
+
+    def error_counts(self):
+        """Number of bad rows per feature, for features with any."""
+        return {name: int(n) for name, n in zip(feature_names, self.invalid.sum(axis=0)) if n}
+
+    def messages(self, row):
+        """Every error of one row, in feature order."""
+        return [
+            error_message(name, code) for name, code in zip(feature_names, self.codes[row]) if code != OK
+        ]
+
+    def error_fields(self):
+        """``"; "``-joined names of the bad fields of every row ("" for valid rows)."""
+        fields = np.full(len(self.codes), "", dtype=object)
+        invalid = self.invalid
+        for j in np.flatnonzero(invalid.any(axis=0)):
+            bad = invalid[:, j]
+            fields[bad] = np.where(fields[bad] == "", feature_names[j], fields[bad] + "; " + feature_names[j])
+        return fields
+
+
+def validate_matrix(X, unparsed=None):
+    """Apply the blank policy to a (rows, 12) float matrix and check it.
+
+    Blank inputs are NaN in ``X``; ``unparsed`` marks the cells that were
+    given but could not be read as numbers.  Returns the filled matrix and
+    its ``Validation``.
+    """
+    with metrics.time("validation"):
+        X = np.array(X, dtype=float, ndmin=2)
+        if unparsed is None:
+            unparsed = np.zeros(X.shape, dtype=bool)
+
+        # Blank or unreadable optional readings count as 0, like the sidebar
+        X = np.where(np.isnan(X) & _has_blank, _blank, X)
+
+        codes = np.zeros(X.shape, dtype=np.int8)
+        nan = np.isnan(X)
+        codes[nan] = MISSING
+        codes[nan & unparsed] = NOT_A_NUMBER
+        with np.errstate(invalid="ignore"):
+            codes[_integer & ~nan & (X != np.round(X))] = NOT_AN_INTEGER
+        codes[X < _low] = BELOW_MIN
+        codes[X > _high] = ABOVE_MAX
+        validation = Validation(codes)
+
+    metrics.increment("validated_rows", len(X))
+    metrics.increment("validation_failures", int((~validation.valid).sum()))
+    return X, validation
+
+
+def validate_frame(df):
+    """``validate_matrix`` for a DataFrame with the ``feature_names`` columns.
+
+    Optional columns may be left out.  Raises ValueError when a required
+    column is missing.
+    """
+    import pandas as pd
+
+    missing = [name for name in feature_names if name not in df.columns and feature_schema[name].blank is None]
+    if missing:
+        raise ValueError(f"Missing columns: {', '.join(missing)}")
+
+    X = np.full((len(df), len(feature_names)), np.nan)
+    unparsed = np.zeros(X.shape, dtype=bool)
+    for j, name in enumerate(feature_names):
+        if name not in df.columns:
+            continue
+        raw = df[name]
+        column = pd.to_numeric(raw, errors='coerce')
+        if name in option_values:
+            column = column.fillna(raw.map(option_values[name]))
+        X[:, j] = column.to_numpy(dtype=float)
+        unparsed[:, j] = column.isna().to_numpy() & raw.notna().to_numpy()
+    return validate_matrix(X, unparsed)
+
+
+def validate_records(records):
+    """``validate_matrix`` for a list of dicts keyed by feature name (the JSON API rows)."""
+    X = np.full((len(records), len(feature_names)), np.nan)
+    unparsed = np.zeros(X.shape, dtype=bool)
+    for i, record in enumerate(records):
+        for j, name in enumerate(feature_names):
+            value = record.get(name)
+            if value is None or (isinstance(value, str) and not value.strip()):
+                continue
+            if name in option_values and isinstance(value, str) and value in option_values[name]:
+                value = option_values[name][value]
+            try:
+                X[i, j] = float(value)
+            except (TypeError, ValueError):
+                unparsed[i, j] = True
+    return validate_matrix(X, unparsed)
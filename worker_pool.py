@@ -0,0 +1,171 @@
+"""Multi-process prediction pool.
+
+``model.predict`` is CPU bound and holds the GIL for much of its run, so one
+process cannot use more than about one core however many sessions or requests
+are waiting.  ``WorkerPool`` spreads every large batch over a pool of worker
+processes instead:
+
+* With the ``fork`` start method (the default in a single-threaded process,
+  see ``default_start_method``) the model is loaded in the parent *before*
+  the workers are forked, and ``gc.freeze()`` keeps the garbage collector from
+  touching its objects afterwards, so every worker shares the parent's copy of
+  the model pages copy-on-write.
+* With ``forkserver`` or ``spawn`` each worker loads the model itself.  The
+  compiled model is used there unless ``compiled=False`` is passed: it is
+  memory-mapped from the exported artifact, so the workers still share the
+  same pages through the OS page cache.
+
+``WorkerPool`` has the ``predict`` and ``decision_function`` methods of a
+model, so it can be passed wherever a model is expected::
+
+    pool = WorkerPool(model_path, processes=32)
+    predictions = pool.predict(X)
+
+Every call is predicted in the workers, so concurrent callers (API requests,
+batch uploads) run in parallel even when each sends a single row.  The app's
+sidebar predictions are the exception: they are rescored in the app process
+by each session's ``IncrementalScorer`` (see incremental.py).  Batches below
+``min_parallel_rows`` go to one worker as they are; larger ones are split over
+all of them.
+"""
+import gc
+import multiprocessing
+import os
+import threading
+
+import numpy as np
+
+from stress_model import feature_names, load_model, model_path
+
+# Model of a worker process; inherited from the parent under fork
+_worker_model = None
+
+
+def _init_worker(path, compiled):
+    global _worker_model
+    if _worker_model is None:
+        _worker_model = load_model(path, compiled=compiled)
+    # One compute thread per worker, the pool already uses every core
+    try:
+        from threadpoolctl import threadpool_limits
+    except ImportError:
+        pass
+    else:
+        threadpool_limits(1)
+
+
+def _predict_chunk(X):
+    return _worker_model.predict(X)
+
+
+def _decision_chunk(X):
+    return _worker_model.decision_function(X)
+
+
+def default_start_method():
+    """``fork`` in a single-threaded process, else ``forkserver`` or ``spawn``.
+
+    Forking copies only the calling thread, so a lock held by any other thread
+    at that moment (logging, allocator, BLAS) stays locked forever in the
+    workers.  Pools created from a server's worker threads or from the
+    registry watcher must not fork.
+    """
+    methods = multiprocessing.get_all_start_methods()
+    if "fork" in methods and threading.active_count() == 1:
+        return "fork"
+    return "forkserver" if "forkserver" in methods else "spawn"
+
+
+class WorkerPool:
+    def __init__(self, path=model_path, processes=None, compiled=None, start_method=None, min_parallel_rows=2048):
+        global _worker_model
+        if start_method is None:
+            start_method = default_start_method()
+        if compiled is None and start_method != "fork":
+            # The workers load the model themselves; memory-mapped, they share its pages
+            compiled = True
+        self.path = path
+        self.processes = processes or os.cpu_count() or 1
+        self.min_parallel_rows = min_parallel_rows
+        self.start_method = start_method
+        # Calls running in the workers; a closed pool shuts down when the last one returns
+        self._lock = threading.Lock()
+        self._in_flight = 0
+        self._closing = False
+
+        self.model = load_model(path, compiled=compiled)
+        if start_method == "fork":
+            _worker_model = self.model
+            # Move everything allocated so far out of the collector's reach, so
+            # the forked workers do not dirty the shared pages by scanning them
+            gc.freeze()
+        try:
+            context = multiprocessing.get_context(start_method)
+            self._pool = context.Pool(self.processes, initializer=_init_worker, initargs=(path, compiled))
+        finally:
+            if start_method == "fork":
+                _worker_model = None
+                gc.unfreeze()
+
+    @property
+    def classes_(self):
+        return self.model.classes_
+
+    def _map(self, local, remote, X):
+        X = np.asarray(X, dtype=float).reshape(-1, len(feature_names))
+        with self._lock:
+            closing = self._closing
+            if not closing:
+                self._in_flight += 1
+        if closing:
+            # Replaced while the caller still held it; the parent has the model too
+            return local(X)
+        try:
+            if len(X) < self.min_parallel_rows or self.processes == 1:
+                # One task per call: concurrent sessions and requests still run on
+                # different workers, and splitting a small batch costs more than it saves
+                return self._pool.apply(remote, (X,))
+            # About two chunks per worker keeps them all busy without much IPC overhead
+            chunks = np.array_split(X, min(self.processes * 2, len(X) // max(1, self.min_parallel_rows // 2)))
+            return np.concatenate(self._pool.map(remote, chunks))
+        finally:
+            with self._lock:
+                self._in_flight -= 1
+                shut_down = self._closing and not self._in_flight
+            if shut_down:
+                self._shut_down()
+
+    def predict(self, X):
+        return self._map(self.model.predict, _predict_chunk, X)
+
+    def decision_function(self, X):
+        return self._map(self.model.decision_function, _decision_chunk, X)
+
+    def close(self):
+        """Stop the workers once the calls in flight have returned.
+
+        A model swap closes the pool it replaces while other threads may still
+        be predicting with it; those calls finish in the workers, and calls
+        made after ``close`` run in this process.
+        """
+        with self._lock:
+            self._closing = True
+            idle = not self._in_flight
+        if idle:
+            self._shut_down()
+
+    def _shut_down(self):
+        self._pool.close()
+        self._pool.join()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+def pool_from_env(path=model_path, compiled=None):
+    """A ``WorkerPool`` sized by ``STRESS_WORKERS``, or None when it is unset or 0."""
+    processes = int(os.environ.get("STRESS_WORKERS", "0"))
+    return WorkerPool(path, processes, compiled) if processes > 0 else None